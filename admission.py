@@ -0,0 +1,252 @@
+"""
+ARCHITECT-GPT - Admission Control
+Created by: Levansh Bhan
+
+Admission control for the expensive model path. Every Streamlit session that
+asks for an AI response first passes a per-session token-bucket rate limit,
+then waits in a bounded priority queue for one of a fixed number of generation
+slots. Sessions that have asked a lot recently are queued behind lighter users,
+and requests that wait too long are shed so the caller can answer with the
+canned fallback responses instead of loading models.
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is refused before it enters the queue"""
+
+    def __init__(self, reason, retry_after=0.0):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `capacity` banked"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        if now <= self.updated:
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, now=None):
+        """Take one token if available"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self, now=None):
+        """Seconds until the next token becomes available"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1 or self.rate <= 0:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def is_idle(self, now):
+        """True once the bucket has refilled completely"""
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class Ticket:
+    """A single queued request"""
+
+    def __init__(self, ticket_id, session_id, priority, enqueued_at):
+        self.ticket_id = ticket_id
+        self.session_id = session_id
+        self.priority = priority
+        self.enqueued_at = enqueued_at
+        self.admitted_at = None
+        self.state = "queued"  # queued -> active -> released, or queued -> shed
+
+    def __lt__(self, other):
+        return (self.priority, self.ticket_id) < (other.priority, other.ticket_id)
+
+
+class AdmissionController:
+    """Bounded priority queue in front of a fixed number of generation slots"""
+
+    def __init__(self, max_concurrent=1, max_queue=16, rate_per_minute=6, burst=3,
+                 max_wait_seconds=30.0, history_seconds=300.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.max_wait_seconds = max_wait_seconds
+        self.history_seconds = history_seconds
+
+        self._cond = threading.Condition()
+        self._heap = []
+        self._active = 0
+        self._ids = itertools.count(1)
+        self._buckets = {}
+        self._history = {}
+        self._stats = {
+            "submitted": 0,
+            "admitted": 0,
+            "rate_limited": 0,
+            "queue_full": 0,
+            "shed": 0,
+            "total_wait_seconds": 0.0,
+        }
+
+    @classmethod
+    def from_env(cls):
+        """Build a controller from ARCHITECT_* environment variables"""
+        # One slot per generation worker unless configured otherwise; ARCHITECT_WORKERS=0 means in-process
+        workers = int(os.getenv("ARCHITECT_WORKERS", "1"))
+        return cls(
+            max_concurrent=int(os.getenv("ARCHITECT_MAX_CONCURRENT", max(1, workers))),
+            max_queue=int(os.getenv("ARCHITECT_MAX_QUEUE", "16")),
+            rate_per_minute=float(os.getenv("ARCHITECT_RATE_PER_MINUTE", "6")),
+            burst=int(os.getenv("ARCHITECT_RATE_BURST", "3")),
+            max_wait_seconds=float(os.getenv("ARCHITECT_MAX_QUEUE_WAIT", "30")),
+        )
+
+    def _prune(self, now):
+        # Forget sessions that have gone quiet so the maps don't grow forever
+        for session_id in list(self._buckets):
+            if self._buckets[session_id].is_idle(now) and not self._recent_requests(session_id, now):
+                del self._buckets[session_id]
+                self._history.pop(session_id, None)
+
+    def _recent_requests(self, session_id, now):
+        history = self._history.setdefault(session_id, deque())
+        while history and now - history[0] > self.history_seconds:
+            history.popleft()
+        return history
+
+    def submit(self, session_id):
+        """Rate-limit and enqueue a request; raises AdmissionRejected if refused"""
+        now = time.monotonic()
+        with self._cond:
+            self._prune(now)
+            bucket = self._buckets.get(session_id)
+            if bucket is None:
+                bucket = TokenBucket(self.rate_per_minute / 60.0, self.burst)
+                self._buckets[session_id] = bucket
+
+            if not bucket.try_acquire(now):
+                self._stats["rate_limited"] += 1
+                retry_after = bucket.retry_after(now)
+                raise AdmissionRejected(
+                    f"Rate limit reached, try again in {retry_after:.0f}s", retry_after)
+
+            if len(self._heap) >= self.max_queue:
+                self._stats["queue_full"] += 1
+                raise AdmissionRejected("Request queue is full", self.max_wait_seconds)
+
+            # Heavier recent users get a larger priority number and queue later
+            history = self._recent_requests(session_id, now)
+            ticket = Ticket(next(self._ids), session_id, len(history), now)
+            history.append(now)
+            heapq.heappush(self._heap, ticket)
+            self._stats["submitted"] += 1
+            return ticket
+
+    def position(self, ticket):
+        """1-based position among waiting tickets, or 0 once admitted"""
+        with self._cond:
+            return self._position(ticket)
+
+    def _position(self, ticket):
+        if ticket.state != "queued":
+            return 0
+        return 1 + sum(1 for other in self._heap if other < ticket)
+
+    def acquire(self, ticket, on_wait=None, poll_seconds=0.5):
+        """
+        Block until the ticket reaches the head of the queue and a slot is free.
+
+        Returns True once admitted. Returns False if the ticket waited longer than
+        max_wait_seconds, in which case it is shed and the caller should fall back.
+        `on_wait(position, waited_seconds)` is called periodically while waiting.
+        """
+        deadline = ticket.enqueued_at + self.max_wait_seconds
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._shed_expired_head(now)
+                if ticket.state == "shed":
+                    return False
+                if self._active < self.max_concurrent and self._heap and self._heap[0] is ticket:
+                    heapq.heappop(self._heap)
+                    self._active += 1
+                    ticket.state = "active"
+                    ticket.admitted_at = now
+                    self._stats["admitted"] += 1
+                    self._stats["total_wait_seconds"] += now - ticket.enqueued_at
+                    self._cond.notify_all()
+                    return True
+
+                if now >= deadline:
+                    self._remove(ticket)
+                    self._shed(ticket)
+                    return False
+
+                if on_wait is not None:
+                    position = self._position(ticket)
+                    # Don't hold the lock while the UI updates
+                    self._cond.release()
+                    try:
+                        on_wait(position, now - ticket.enqueued_at)
+                    finally:
+                        self._cond.acquire()
+                self._cond.wait(min(poll_seconds, max(0.0, deadline - time.monotonic())))
+
+    def _shed(self, ticket):
+        ticket.state = "shed"
+        self._stats["shed"] += 1
+        self._cond.notify_all()
+
+    def _shed_expired_head(self, now):
+        # A caller that stopped without releasing leaves its ticket behind; don't let it block the queue
+        while self._heap and now - self._heap[0].enqueued_at >= self.max_wait_seconds:
+            self._shed(heapq.heappop(self._heap))
+
+    def _remove(self, ticket):
+        try:
+            self._heap.remove(ticket)
+        except ValueError:
+            return
+        heapq.heapify(self._heap)
+
+    def release(self, ticket):
+        """Give the slot back (or drop the ticket if it never got one)"""
+        if ticket is None:
+            return
+        with self._cond:
+            if ticket.state == "active":
+                self._active -= 1
+            elif ticket.state == "queued":
+                self._remove(ticket)
+            ticket.state = "released"
+            self._cond.notify_all()
+
+    def stats(self):
+        """Snapshot of queue depth and counters"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["active"] = self._active
+            stats["queued"] = len(self._heap)
+            stats["avg_wait_seconds"] = (
+                stats["total_wait_seconds"] / stats["admitted"] if stats["admitted"] else 0.0
+            )
+            return stats
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark for document chunking settings.
+
+For each setting it reports corpus size (chunks, tokens, and overlap inflation
+over the source text), ingestion time (chunking + embedding) and retrieval
+quality. Quality is measured by sampling sentences from the documents as
+queries. A query counts as a hit@k when one of its k nearest chunks covers at
+least half of that sentence's text, so a splitter that cuts a sentence in two
+is not penalized when the chunk holding most of it is retrieved. MRR is the mean
+reciprocal rank of the first such chunk. The splitters the app used before are
+included as a baseline: load_and_split()'s default RecursiveCharacterTextSplitter
+(4000/200 characters) for PDFs and 500/100 characters for everything else.
+
+Usage:
+    python benchmark_chunking.py upload/*.pdf upload/*.txt
+    python benchmark_chunking.py docs/design.md --settings 128:0 200:20 256:40 --k 4
+"""
+
+import argparse
+import random
+import re
+import time
+from difflib import SequenceMatcher
+
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.embeddings import SentenceTransformerEmbeddings
+
+from chunking import chunk_documents, count_tokens, document_type, load_documents
+from embedding_cache import normalize_text
+from vector_compression import top_k
+from vectorstore import EMBEDDING_MODEL
+
+# Deliberately simpler than chunking.SENTENCE_BOUNDARY so queries don't follow the new chunker's own cut points
+QUERY_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+MIN_COVERAGE = 0.5
+
+
+def sample_queries(documents, count, seed=0):
+    """Sentences of 8-40 words taken from the source documents"""
+    sentences = []
+    for document in documents:
+        text = " ".join(document.page_content.split())
+        sentences.extend(s for s in QUERY_BOUNDARY.split(text) if 8 <= len(s.split()) <= 40)
+    random.Random(seed).shuffle(sentences)
+    return sentences[:count]
+
+
+def covers(chunk_text, sentence):
+    """True if the chunk holds at least MIN_COVERAGE of the sentence as one contiguous span"""
+    match = SequenceMatcher(None, sentence, chunk_text, autojunk=False).find_longest_match(
+        0, len(sentence), 0, len(chunk_text))
+    return match.size >= MIN_COVERAGE * len(sentence)
+
+
+def legacy_chunks(loaded):
+    """Chunks from the splitters the upload page used before token-aware chunking"""
+    chunks = []
+    for _, doc_type, docs in loaded:
+        # PDFs went through load_and_split(), i.e. the splitter's defaults
+        splitter = RecursiveCharacterTextSplitter() if doc_type == "pdf" else \
+            RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
+        chunks.extend(splitter.split_documents(docs))
+    return chunks
+
+
+def evaluate(chunks, queries, query_vectors, embeddings, k):
+    """Embed the chunks and score retrieval of the sampled sentences"""
+    started = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents([c.page_content for c in chunks]), dtype=np.float32)
+    embed_seconds = time.perf_counter() - started
+
+    normalized = [normalize_text(c.page_content) for c in chunks]
+    hits, reciprocal_ranks = 0, []
+    for query, query_vector in zip(queries, query_vectors):
+        needle = normalize_text(query)
+        ranked = top_k(query_vector, vectors, k)
+        rank = next((r for r, i in enumerate(ranked, 1) if covers(normalized[i], needle)), None)
+        hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+    return embed_seconds, hits / max(1, len(queries)), float(np.mean(reciprocal_ranks)) if queries else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunk size and overlap settings")
+    parser.add_argument("files", nargs="+", help="Documents to ingest")
+    parser.add_argument("--settings", nargs="+", default=["128:0", "200:20", "256:40"],
+                        help="chunk_tokens:overlap_tokens pairs")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    print("✂️ Chunking Benchmark")
+    print("=" * 60)
+    loaded = [(path, document_type(path), load_documents(path)) for path in args.files]
+    all_documents = [doc for _, _, docs in loaded for doc in docs]
+    source_tokens = sum(count_tokens(doc.page_content) for doc in all_documents)
+    print(f"Documents: {len(args.files)} · source tokens: {source_tokens}")
+
+    embeddings = SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
+    queries = sample_queries(all_documents, args.queries)
+    query_vectors = np.asarray(embeddings.embed_documents(queries), dtype=np.float32) if queries else []
+    print(f"Queries: {len(queries)} sampled sentences · k = {args.k}")
+
+    runs = [("legacy splitters", None)]
+    for setting in args.settings:
+        chunk_tokens, overlap_tokens = (int(x) for x in setting.split(":"))
+        runs.append((f"tokens {chunk_tokens}:{overlap_tokens}", (chunk_tokens, overlap_tokens)))
+
+    results = []
+    for label, setting in runs:
+        print(f"\n🔧 {label}...")
+        started = time.perf_counter()
+        if setting is None:
+            chunks = legacy_chunks(loaded)
+        else:
+            chunks = [chunk for _, doc_type, docs in loaded
+                      for chunk in chunk_documents(docs, doc_type, setting[0], setting[1])]
+        chunk_seconds = time.perf_counter() - started
+
+        embed_seconds, hit_rate, mrr = evaluate(chunks, queries, query_vectors, embeddings, args.k)
+        token_counts = [count_tokens(chunk.page_content) for chunk in chunks]
+        results.append({
+            "label": label,
+            "chunks": len(chunks),
+            "tokens": sum(token_counts),
+            "max_tokens": max(token_counts, default=0),
+            "inflation": sum(token_counts) / max(1, source_tokens) - 1,
+            "ingest_s": chunk_seconds + embed_seconds,
+            "hit_rate": hit_rate,
+            "mrr": mrr,
+        })
+
+    print("\n" + "=" * 60)
+    print("📊 Results:")
+    print(f"{'setting':<24} {'chunks':>7} {'tokens':>8} {'max tok':>8} {'inflation':>9} {'ingest s':>9} "
+          f"{'hit@' + str(args.k):>7} {'MRR':>6}")
+    for r in results:
+        print(f"{r['label']:<24} {r['chunks']:>7} {r['tokens']:>8} {r['max_tokens']:>8} {r['inflation']:>9.1%} "
+              f"{r['ingest_s']:>9.2f} {r['hit_rate']:>7.2%} {r['mrr']:>6.3f}")
+    print("\n💡 Chunks over 256 tokens are truncated by all-MiniLM-L6-v2 when embedded.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark for speculative (assisted) decoding on CPU.
+
+Generates the same prompts greedily with the target model alone and with a draft
+model proposing tokens, then reports tokens/sec for both, the speed-up, the
+draft acceptance rate and how many tokens each target forward pass produced.
+With greedy decoding and a draft that shares the target's tokenizer the outputs
+are identical, which the benchmark checks.
+
+By default the target runs in float32 on the CPU, which is not how load_gemma()
+serves it. Pass --deployed to load it the way the app does (float16,
+device_map="auto") so the numbers describe the production setup.
+
+Usage:
+    python benchmark_speculative.py                                  # gemma-2b + distilgpt2
+    python benchmark_speculative.py --deployed                       # as served by load_gemma()
+    python benchmark_speculative.py --target gpt2-large --draft distilgpt2
+"""
+
+import argparse
+import os
+
+import torch
+
+import generation
+
+PROMPTS = [
+    "What are the best practices for microservices architecture?",
+    "Explain the CQRS pattern and when to use it.",
+    "How do I design a resilient API gateway?",
+    "What are the trade-offs of event sourcing?",
+]
+
+
+def run(model, tokenizer, prompts, max_new_tokens, assistant=None):
+    """Generate every prompt once; returns (outputs, GenerationStats summary)"""
+    stats = generation.GenerationStats()
+    outputs = [
+        generation.generate_text(model, tokenizer, prompt, max_new_tokens=max_new_tokens, do_sample=False,
+                                 assistant=assistant, stats=stats)
+        for prompt in prompts
+    ]
+    return outputs, stats.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark speculative decoding")
+    parser.add_argument("--target", default=generation.GEMMA_MODEL)
+    parser.add_argument("--draft", default=generation.DRAFT_MODEL)
+    parser.add_argument("--draft-tokens", type=int, nargs="+", default=[3, 5, 8],
+                        help="Tokens proposed by the draft per verification step")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=0, help="Torch CPU threads (0 = default)")
+    parser.add_argument("--deployed", action="store_true",
+                        help="Load the target like load_gemma(): float16 with device_map='auto'")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    token = os.getenv("HUGGINGFACE_API_TOKEN")
+
+    dtype, device_map = (torch.float16, "auto") if args.deployed else (torch.float32, None)
+    print(f"⚡ Speculative Decoding Benchmark ({'deployed: float16, device_map=auto' if args.deployed else 'CPU float32'})")
+    print("=" * 60)
+    model, tokenizer = generation.load_causal_lm(args.target, token=token, torch_dtype=dtype,
+                                                 device_map=device_map)
+    prompts = [generation.build_gemma_prompt(p) if "gemma" in args.target.lower() else p for p in PROMPTS]
+
+    # Warm up so the first measured run doesn't pay one-off costs
+    run(model, tokenizer, prompts[:1], 8)
+    baseline_outputs, baseline = run(model, tokenizer, prompts, args.max_new_tokens)
+    print(f"Target {args.target}: {baseline['tokens_per_second']:.2f} tokens/s")
+
+    results = []
+    for draft_tokens in args.draft_tokens:
+        assistant = generation.load_assistant(model, token=token, model_name=args.draft,
+                                              num_assistant_tokens=draft_tokens)
+        # Keep the draft length fixed so each setting is measured as configured
+        assistant[0].generation_config.num_assistant_tokens_schedule = "constant"
+        compatible = generation.tokenizers_compatible(tokenizer, assistant[1])
+        outputs, summary = run(model, tokenizer, prompts, args.max_new_tokens, assistant)
+        results.append((draft_tokens, compatible, outputs == baseline_outputs, summary))
+
+    print("\n" + "=" * 60)
+    print(f"📊 Draft {args.draft} (greedy, {args.max_new_tokens} new tokens, {len(PROMPTS)} prompts):")
+    print(f"{'draft tok':>9} {'tok/s':>8} {'speed-up':>9} {'accept':>7} {'tok/fwd':>8} {'same vocab':>11} "
+          f"{'same output':>12}")
+    for draft_tokens, compatible, identical, summary in results:
+        speedup = summary["tokens_per_second"] / baseline["tokens_per_second"] if baseline["tokens_per_second"] else 0
+        print(f"{draft_tokens:>9} {summary['tokens_per_second']:>8.2f} {speedup:>8.2f}x "
+              f"{summary['acceptance_rate']:>7.0%} {summary['tokens_per_target_forward']:>8.2f} "
+              f"{'yes' if compatible else 'no':>11} {'yes' if identical else 'no':>12}")
+        if summary["fallbacks"]:
+            print(f"   ⚠️ {summary['fallbacks']} generations fell back to plain decoding")
+
+
+if __name__ == "__main__":
+    main()
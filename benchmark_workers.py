@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the multi-worker generation pool.
+
+Measures throughput and memory at different worker counts. Memory is reported as
+the summed RSS of the pool processes (which counts shared pages once per process)
+and as the summed PSS (which splits shared pages between the processes that map
+them, so it is the real footprint of the pool).
+
+Usage:
+    python benchmark_workers.py --model gpt2 --workers 1 2 4 8
+    python benchmark_workers.py --model google/gemma-2b --requests 8
+"""
+
+import argparse
+import os
+import time
+
+import torch
+from transformers import AutoTokenizer
+
+import generation
+from worker_pool import GenerationWorkerPool
+
+PROMPTS = [
+    "What are the best practices for microservices architecture?",
+    "Explain the CQRS pattern and when to use it.",
+    "How do I design a resilient API gateway?",
+    "What is the difference between monolithic and microservices architecture?",
+    "How should I plan a multi-cloud deployment?",
+    "What are the trade-offs of event sourcing?",
+    "How do circuit breakers improve fault tolerance?",
+    "What is hexagonal architecture?",
+]
+
+
+def read_memory_kb(pid):
+    """Return (rss_kb, pss_kb) for a process, read from /proc"""
+    rss = pss = 0
+    with open(f"/proc/{pid}/status") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                rss = int(line.split()[1])
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as fh:
+            for line in fh:
+                if line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except FileNotFoundError:
+        pss = rss
+    return rss, pss
+
+
+def run(workers, args, tokenizer):
+    """Start a pool with `workers` processes and push the prompt load through it"""
+    token = os.getenv("HUGGINGFACE_API_TOKEN")
+    started = time.perf_counter()
+    pool = GenerationWorkerPool(
+        workers,
+        generation.load_causal_lm,
+        generation.generate_text,
+        loader_kwargs={"model_name": args.model, "token": token,
+                       "torch_dtype": torch.float32, "device_map": None},
+    )
+    startup = time.perf_counter() - started
+
+    try:
+        prompts = [PROMPTS[i % len(PROMPTS)] for i in range(args.requests)]
+        started = time.perf_counter()
+        futures = [pool.submit(prompt, max_new_tokens=args.max_new_tokens, do_sample=False)
+                   for prompt in prompts]
+        outputs = [future.result() for future in futures]
+        elapsed = time.perf_counter() - started
+
+        rss = pss = 0
+        for pid in pool.pids:
+            process_rss, process_pss = read_memory_kb(pid)
+            rss += process_rss
+            pss += process_pss
+    finally:
+        pool.close()
+
+    tokens = sum(len(tokenizer.encode(output)) for output in outputs)
+    return {
+        "workers": workers,
+        "startup_s": startup,
+        "requests_per_s": len(prompts) / elapsed,
+        "tokens_per_s": tokens / elapsed,
+        "rss_mb": rss / 1024,
+        "pss_mb": pss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the multi-worker generation pool")
+    parser.add_argument("--model", default="gpt2", help="Hugging Face model to load in the pool")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    args = parser.parse_args()
+
+    print("🚀 Multi-Worker Generation Benchmark")
+    print("=" * 60)
+    print(f"Model: {args.model} · requests: {args.requests} · max new tokens: {args.max_new_tokens}")
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model, token=os.getenv("HUGGINGFACE_API_TOKEN"))
+    results = []
+    for workers in args.workers:
+        print(f"\n🔧 Running with {workers} worker(s)...")
+        results.append(run(workers, args, tokenizer))
+
+    baseline = results[0]
+    print("\n" + "=" * 60)
+    print("📊 Results:")
+    print(f"{'workers':>7} {'req/s':>8} {'tok/s':>8} {'RSS MB':>9} {'PSS MB':>9} {'PSS/N copies':>13}")
+    for result in results:
+        # Memory of N fully independent processes, scaled from the smallest run
+        independent = baseline["pss_mb"] / baseline["workers"] * result["workers"]
+        print(f"{result['workers']:>7} {result['requests_per_s']:>8.2f} {result['tokens_per_s']:>8.1f} "
+              f"{result['rss_mb']:>9.0f} {result['pss_mb']:>9.0f} {result['pss_mb'] / independent:>12.0%}")
+
+
+if __name__ == "__main__":
+    main()
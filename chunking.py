@@ -0,0 +1,314 @@
+"""
+ARCHITECT-GPT - Document Chunking
+Created by: Levansh Bhan
+
+Token-aware, structure-aware chunking for uploaded documents.
+
+Documents are first split into structural blocks: headings, paragraphs and
+tables. Blocks are then packed into chunks measured in tokens of the embedding
+model rather than characters, so a chunk never silently overflows what
+all-MiniLM-L6-v2 can embed (256 word pieces). Chunks never straddle a heading.
+Each chunk starts with its section path so it keeps its context. A paragraph
+that is too long is split at sentence boundaries, and a table that is too long
+is split by rows with the header row repeated. Overlap is whole trailing
+sentences, capped in tokens.
+
+Chunk size and overlap are configured per document type in CHUNK_SETTINGS and
+can be overridden with the ARCHITECT_CHUNK_SETTINGS environment variable, e.g.
+ARCHITECT_CHUNK_SETTINGS='{"pdf": {"chunk_tokens": 180, "overlap_tokens": 0}}'.
+"""
+
+import json
+import os
+import re
+import threading
+
+from langchain_core.documents import Document
+
+TOKENIZER_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+CHUNK_SETTINGS = {
+    "pdf": {"chunk_tokens": 200, "overlap_tokens": 20},
+    "docx": {"chunk_tokens": 200, "overlap_tokens": 20},
+    "md": {"chunk_tokens": 220, "overlap_tokens": 0},
+    "txt": {"chunk_tokens": 200, "overlap_tokens": 20},
+}
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-Z0-9])")
+MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*$")
+NUMBERED_HEADING = re.compile(r"^(\d+(?:\.\d+)+)\.?\s+([A-Z][^.:]{0,80})$")
+SETEXT_UNDERLINE = re.compile(r"^(=+|-+)$")
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def count_tokens(text):
+    """Number of embedding-model tokens in `text` (word/punctuation estimate if transformers is missing)"""
+    global _tokenizer
+    with _tokenizer_lock:
+        if _tokenizer is None:
+            try:
+                from transformers import AutoTokenizer
+                _tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_MODEL)
+            except Exception:
+                _tokenizer = False
+    if _tokenizer:
+        return len(_tokenizer.encode(text, add_special_tokens=False))
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def chunk_settings(doc_type):
+    """Chunk size and overlap for a document type, including environment overrides"""
+    settings = dict(CHUNK_SETTINGS.get(doc_type, CHUNK_SETTINGS["txt"]))
+    overrides = json.loads(os.getenv("ARCHITECT_CHUNK_SETTINGS", "{}"))
+    settings.update(overrides.get(doc_type, {}))
+    return settings
+
+
+def document_type(file_path):
+    """Map a file name to one of the CHUNK_SETTINGS document types"""
+    extension = os.path.splitext(file_path)[-1].lower().lstrip(".")
+    return {"markdown": "md"}.get(extension, extension if extension in CHUNK_SETTINGS else "txt")
+
+
+def _load_docx(file_path):
+    # Keep Word structure: heading styles become markdown headings, tables become pipe rows
+    import docx
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    document = docx.Document(file_path)
+    lines = []
+    for element in document.element.body.iterchildren():
+        if element.tag.endswith("}p"):
+            paragraph = Paragraph(element, document)
+            text = paragraph.text.strip()
+            style = paragraph.style.name if paragraph.style is not None else ""
+            match = re.match(r"Heading (\d)", style)
+            if match and text:
+                lines.extend(["", "#" * int(match.group(1)) + " " + text, ""])
+            else:
+                lines.extend([text, ""])
+        elif element.tag.endswith("}tbl"):
+            table = Table(element, document)
+            lines.append("")
+            for row in table.rows:
+                lines.append("| " + " | ".join(cell.text.strip() for cell in row.cells) + " |")
+            lines.append("")
+    return [Document(page_content="\n".join(lines), metadata={"source": file_path})]
+
+
+def load_documents(file_path):
+    """Load a PDF (one Document per page), DOCX, Markdown or text file"""
+    doc_type = document_type(file_path)
+    if doc_type == "pdf":
+        from langchain_community.document_loaders import PyPDFLoader
+        return PyPDFLoader(file_path=file_path).load()
+    if doc_type == "docx":
+        return _load_docx(file_path)
+    from langchain_community.document_loaders import TextLoader
+    return TextLoader(file_path, autodetect_encoding=True).load()
+
+
+def _heading(line, next_line):
+    """Return (level, title) if the line is a heading, else None"""
+    match = MARKDOWN_HEADING.match(line)
+    if match:
+        return len(match.group(1)), match.group(2)
+    match = NUMBERED_HEADING.match(line)
+    if match:
+        return match.group(1).count(".") + 1, line
+    if SETEXT_UNDERLINE.match(next_line) and len(line.split()) <= 12:
+        return (1 if next_line.startswith("=") else 2), line
+    if line.isupper() and 1 <= len(line.split()) <= 10:
+        return 1, line
+    return None
+
+
+def _is_table_row(line):
+    return line.count("|") >= 2 or line.count("\t") >= 2
+
+
+def split_blocks(text):
+    """Split text into ("heading", level, title), ("paragraph", text) and ("table", rows) blocks"""
+    blocks, paragraph, table = [], [], []
+
+    def flush():
+        if paragraph:
+            blocks.append(("paragraph", " ".join(paragraph)))
+            paragraph.clear()
+        if table:
+            blocks.append(("table", list(table)))
+            table.clear()
+
+    lines = text.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        next_line = lines[i + 1].strip() if i + 1 < len(lines) else ""
+        if not line:
+            flush()
+            i += 1
+            continue
+        heading = _heading(line, next_line) if not _is_table_row(line) else None
+        if heading:
+            flush()
+            blocks.append(("heading", heading[0], heading[1]))
+            i += 2 if SETEXT_UNDERLINE.match(next_line) and not MARKDOWN_HEADING.match(line) else 1
+            continue
+        if _is_table_row(line):
+            if paragraph:
+                blocks.append(("paragraph", " ".join(paragraph)))
+                paragraph.clear()
+            table.append(line)
+        else:
+            if table:
+                blocks.append(("table", list(table)))
+                table.clear()
+            paragraph.append(line)
+        i += 1
+    flush()
+    return blocks
+
+
+def _sections(blocks, stack=None):
+    """
+    Group blocks under their heading path, e.g. "Design > Storage".
+
+    `stack` holds the open (level, title) headings and is updated in place, so a
+    caller can carry it from one page of a document to the next.
+    """
+    stack = [] if stack is None else stack
+    current = []
+    for block in blocks:
+        if block[0] == "heading":
+            if current:
+                yield " > ".join(title for _, title in stack), current
+                current = []
+            _, level, title = block
+            stack[:] = [(lvl, t) for lvl, t in stack if lvl < level] + [(level, title)]
+        else:
+            current.append(block)
+    if current:
+        yield " > ".join(title for _, title in stack), current
+
+
+def _split_words(text, budget, count):
+    words, pieces, current = text.split(), [], []
+    for word in words:
+        if current and count(" ".join(current + [word])) > budget:
+            pieces.append(" ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def _units(block, budget, count):
+    """Break a block into (text, tokens, separator) units that each fit in `budget`"""
+    if block[0] == "table":
+        rows = block[1]
+        text = "\n".join(rows)
+        tokens = count(text)
+        if tokens <= budget:
+            return [(text, tokens, "\n\n")]
+        # Too big: split by rows and repeat the header row in every piece
+        header, body = rows[0], rows[1:]
+        if len(body) > 1 and re.fullmatch(r"[|\-:\s\t]+", body[0]):
+            header, body = header + "\n" + body[0], body[1:]
+        units, current = [], []
+        for row in body:
+            candidate = "\n".join([header] + current + [row])
+            if current and count(candidate) > budget:
+                piece = "\n".join([header] + current)
+                units.append((piece, count(piece), "\n\n"))
+                current = []
+            current.append(row)
+        if current:
+            piece = "\n".join([header] + current)
+            units.append((piece, count(piece), "\n\n"))
+        return units
+
+    text = block[1]
+    tokens = count(text)
+    if tokens <= budget:
+        return [(text, tokens, "\n\n")]
+    units = []
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        sentence_tokens = count(sentence)
+        pieces = [sentence] if sentence_tokens <= budget else _split_words(sentence, budget, count)
+        for piece in pieces:
+            units.append((piece, sentence_tokens if len(pieces) == 1 else count(piece), " " if units else "\n\n"))
+    return units
+
+
+def _overlap(units, overlap_tokens, count):
+    """Trailing sentences of the previous chunk, at most `overlap_tokens` long"""
+    if overlap_tokens <= 0 or not units:
+        return []
+    carried, total = [], 0
+    for text, _, _ in reversed(units):
+        for sentence in reversed(SENTENCE_BOUNDARY.split(text)):
+            tokens = count(sentence)
+            if total + tokens > overlap_tokens:
+                return carried
+            carried.insert(0, (sentence, tokens, " "))
+            total += tokens
+    return carried
+
+
+def _join(units):
+    return "".join((sep if i else "") + text for i, (text, _, sep) in enumerate(units)).strip()
+
+
+def chunk_text(text, chunk_tokens=200, overlap_tokens=20, count=count_tokens, headings=None):
+    """
+    Split text into (section, chunk_text) pairs of at most ~chunk_tokens tokens.
+
+    `headings` is the open heading stack from the previous page, if any; it is updated in place.
+    """
+    chunks = []
+    for section, blocks in _sections(split_blocks(text), headings):
+        prefix = f"{section}\n" if section else ""
+        budget = max(chunk_tokens // 2, chunk_tokens - (count(prefix) if prefix else 0))
+        units = [unit for block in blocks for unit in _units(block, budget, count)]
+
+        current, current_tokens, fresh = [], 0, False
+        for unit in units:
+            if fresh and current_tokens + unit[1] > budget:
+                chunks.append((section, prefix + _join(current)))
+                current = _overlap(current, overlap_tokens, count)
+                current_tokens = sum(tokens for _, tokens, _ in current)
+                # Drop overlap if it would push the next unit over the budget
+                while current and current_tokens + unit[1] > budget:
+                    current_tokens -= current.pop(0)[1]
+                fresh = False
+            current.append(unit)
+            current_tokens += unit[1]
+            fresh = True
+        if fresh:
+            chunks.append((section, prefix + _join(current)))
+    return chunks
+
+
+def chunk_documents(documents, doc_type, chunk_tokens=None, overlap_tokens=None, count=count_tokens):
+    """Chunk loaded LangChain Documents, keeping their metadata"""
+    settings = chunk_settings(doc_type)
+    chunk_tokens = chunk_tokens or settings["chunk_tokens"]
+    overlap_tokens = settings["overlap_tokens"] if overlap_tokens is None else overlap_tokens
+
+    chunks = []
+    headings, source = [], None
+    for document in documents:
+        # PDFs load as one Document per page; a section that continues on the next page keeps its heading
+        if document.metadata.get("source") != source:
+            headings, source = [], document.metadata.get("source")
+        for index, (section, text) in enumerate(chunk_text(document.page_content, chunk_tokens, overlap_tokens,
+                                                           count, headings)):
+            metadata = dict(document.metadata, chunk=index, doc_type=doc_type)
+            if section:
+                metadata["section"] = section
+            chunks.append(Document(page_content=text, metadata=metadata))
+    return chunks
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+ARCHITECT-GPT - Knowledge Base Compaction
+Created by: Levansh Bhan
+
+Rebuilds the Chroma knowledge base offline (stop the app first):
+
+1. Copies db/ to a timestamped backup (unless --no-backup)
+2. Reads every chunk of each collection and drops orphans (chunks whose source
+   file no longer exists in upload/ or that have no text) and duplicates (the
+   same normalized text from the same source, e.g. a document uploaded twice)
+3. Rewrites each collection from the surviving chunks and VACUUMs chroma.sqlite3
+4. Removes vector segment directories that no collection references any more
+5. Optionally builds a float16 or int8 compressed index for compressed search
+   and measures its recall against exact search. The index is a flat scan, so it
+   only pays off for collections up to ARCHITECT_COMPRESSED_MAX_ROWS chunks
+
+Usage:
+    python compact_db.py
+    python compact_db.py --compress int8 --recall-queries 200
+    python compact_db.py --dry-run
+"""
+
+import argparse
+import os
+import re
+import shutil
+import sqlite3
+import time
+
+import chromadb
+import numpy as np
+
+from embedding_cache import text_key
+from vector_compression import COMPRESSION_MODES, CompressedIndex, index_dir, recall_at_k, top_k
+
+CHROMA_DIR = "db"
+UPLOAD_DIR = "upload"
+SQLITE_FILE = "chroma.sqlite3"
+UUID_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+def dir_size(path):
+    """Total bytes of all files under a directory"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def human(num_bytes):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(num_bytes) < 1024 or unit == "GB":
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+
+
+def read_collection(collection, page_size):
+    """All ids, embeddings, documents and metadatas of a collection"""
+    ids, embeddings, documents, metadatas = [], [], [], []
+    total = collection.count()
+    for offset in range(0, total, page_size):
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        ids.extend(page["ids"])
+        embeddings.extend(page["embeddings"])
+        documents.extend(page["documents"])
+        metadatas.extend(page["metadatas"])
+    return ids, np.asarray(embeddings, dtype=np.float32), documents, metadatas
+
+
+def select_survivors(documents, metadatas, upload_dir, keep_orphans):
+    """Indices of chunks to keep, plus orphan and duplicate counts"""
+    keep, seen = [], set()
+    orphans = duplicates = 0
+    for i, (text, metadata) in enumerate(zip(documents, metadatas)):
+        source = (metadata or {}).get("source", "")
+        is_orphan = not text or (
+            not keep_orphans and source and not os.path.exists(source)
+            and not os.path.exists(os.path.join(upload_dir, os.path.basename(source)))
+        )
+        if is_orphan:
+            orphans += 1
+            continue
+        key = (source, text_key(text))
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        keep.append(i)
+    return keep, orphans, duplicates
+
+
+def rewrite_collection(client, name, metadata, ids, embeddings, documents, metadatas):
+    """Replace a collection's contents with the given records"""
+    client.delete_collection(name)
+    collection = client.create_collection(name, metadata=metadata or None)
+    step = client.get_max_batch_size()
+    for start in range(0, len(ids), step):
+        collection.add(
+            ids=ids[start:start + step],
+            embeddings=embeddings[start:start + step],
+            documents=documents[start:start + step],
+            metadatas=metadatas[start:start + step],
+        )
+    return collection
+
+
+def remove_orphan_segments(persist_directory):
+    """Delete vector segment directories not referenced by chroma.sqlite3"""
+    with sqlite3.connect(os.path.join(persist_directory, SQLITE_FILE)) as conn:
+        referenced = {row[0] for row in conn.execute("SELECT id FROM segments")}
+    removed = 0
+    for name in os.listdir(persist_directory):
+        path = os.path.join(persist_directory, name)
+        if os.path.isdir(path) and UUID_PATTERN.match(name) and name not in referenced:
+            shutil.rmtree(path)
+            removed += 1
+    return removed
+
+
+def vacuum(persist_directory):
+    """Give the space of deleted rows back to the file system"""
+    conn = sqlite3.connect(os.path.join(persist_directory, SQLITE_FILE))
+    try:
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def measure_recall(index, ids, embeddings, k, rescore_factor, queries):
+    """
+    Recall@k of compressed search with exact re-scoring, using stored vectors as queries.
+
+    Each query's own chunk is left out of both result lists; it is always the exact
+    nearest neighbour and would make recall look better than it is.
+    """
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(ids), size=min(queries, len(ids)), replace=False)
+    exact, approximate = [], []
+    for row in sample:
+        query = embeddings[row]
+        exact.append([ids[i] for i in top_k(query, embeddings, k + 1, index.metric) if i != row][:k])
+        found = index.search_rescored(query, k + 1, rescore_factor)
+        approximate.append([chunk_id for chunk_id in found if chunk_id != ids[row]][:k])
+    return recall_at_k(exact, approximate)
+
+
+def compact_collection(client, collection, args):
+    """Compact one collection and print what changed"""
+    name = collection.name
+    metric = (collection.metadata or {}).get("hnsw:space", "l2")
+    print(f"\n📚 Collection '{name}'")
+    ids, embeddings, documents, metadatas = read_collection(collection, args.page_size)
+    keep, orphans, duplicates = select_survivors(documents, metadatas, args.upload_dir, args.keep_orphans)
+    print(f"   Chunks: {len(ids)} → {len(keep)} (orphans: {orphans}, duplicates: {duplicates})")
+
+    ids = [ids[i] for i in keep]
+    embeddings = embeddings[keep] if len(keep) else embeddings[:0]
+    documents = [documents[i] for i in keep]
+    metadatas = [metadatas[i] for i in keep]
+
+    if not args.dry_run and (orphans or duplicates):
+        rewrite_collection(client, name, collection.metadata, ids, embeddings, documents, metadatas)
+
+    if args.compress and len(ids):
+        index = CompressedIndex.build(ids, embeddings, args.compress, metric)
+        # Chroma keeps its own float32 copy; the index adds to disk use and its codes add to RAM
+        print(f"   Compressed index: {human(index.nbytes)} {args.compress} held in memory while searching, "
+              f"plus {human(embeddings.nbytes)} float32 on disk, memory-mapped for re-scoring")
+        if len(ids) > args.max_rows:
+            print(f"   ⚠️ {len(ids)} chunks is more than ARCHITECT_COMPRESSED_MAX_ROWS ({args.max_rows}); "
+                  f"the app will keep using Chroma's HNSW search for this collection")
+        if args.recall_queries:
+            recall = measure_recall(index, ids, embeddings, args.k, args.rescore_factor, args.recall_queries)
+            print(f"   Recall@{args.k} with {args.rescore_factor}x re-scoring: {recall:.3f}")
+        if not args.dry_run:
+            index.save(index_dir(args.db, name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact the ARCHITECT-GPT knowledge base")
+    parser.add_argument("--db", default=CHROMA_DIR, help="Chroma persist directory")
+    parser.add_argument("--upload-dir", default=UPLOAD_DIR, help="Where uploaded source files live")
+    parser.add_argument("--collection", help="Only compact this collection")
+    parser.add_argument("--keep-orphans", action="store_true", help="Keep chunks whose source file is gone")
+    parser.add_argument("--compress", choices=COMPRESSION_MODES, help="Also build a compressed index")
+    parser.add_argument("--k", type=int, default=4, help="k used for the recall measurement")
+    parser.add_argument("--rescore-factor", type=int, default=4, help="Candidates per result to re-score exactly")
+    parser.add_argument("--recall-queries", type=int, default=100, help="Sampled queries for recall (0 to skip)")
+    parser.add_argument("--max-rows", type=int, default=int(os.getenv("ARCHITECT_COMPRESSED_MAX_ROWS", "250000")),
+                        help="Largest collection the app will search through the compressed index")
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--no-backup", action="store_true")
+    parser.add_argument("--dry-run", action="store_true", help="Report only; change nothing")
+    args = parser.parse_args()
+
+    print("🧹 ARCHITECT-GPT Knowledge Base Compaction")
+    print("=" * 50)
+    size_before = dir_size(args.db)
+
+    if not args.dry_run and not args.no_backup:
+        backup = f"{args.db.rstrip(os.sep)}.bak-{time.strftime('%Y%m%d-%H%M%S')}"
+        shutil.copytree(args.db, backup)
+        print(f"💾 Backup written to {backup}")
+
+    client = chromadb.PersistentClient(path=args.db)
+    collections = [client.get_collection(args.collection)] if args.collection else \
+        [client.get_collection(c if isinstance(c, str) else c.name) for c in client.list_collections()]
+    for collection in collections:
+        compact_collection(client, collection, args)
+
+    if not args.dry_run:
+        del client
+        removed = remove_orphan_segments(args.db)
+        vacuum(args.db)
+        print(f"\n🗑️ Removed {removed} unreferenced segment directories")
+
+    size_after = dir_size(args.db)
+    print("\n" + "=" * 50)
+    print(f"📊 Disk: {human(size_before)} → {human(size_after)} ({human(size_before - size_after)} saved)")
+    if args.compress:
+        print("💡 Set ARCHITECT_COMPRESSED_SEARCH=1 and restart the app to use the compressed index.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+ARCHITECT-GPT - Embedding Cache
+Created by: Levansh Bhan
+
+Persistent cache of text embeddings shared by document ingestion and queries.
+Entries are keyed by the embedding model name and a hash of the normalized chunk
+text, so boilerplate that shows up in many documents (licenses, headers, repeated
+sections across versions) is embedded once. Vectors live in a compact float16 (or
+float32) .npy file that is memory-mapped at startup, next to a small JSON index.
+The cache holds at most `max_entries` vectors and evicts the least recently used.
+A slot freed by eviction is only reused after the index that stopped pointing at
+it has been written, so a crash can never leave the index mapping a key to a
+vector that was overwritten by another text. A few spare rows beyond
+`max_entries` hold new vectors until the periodic index write frees the evicted
+slots, so a full cache does not rewrite its index on every insert.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+CACHE_DIR = os.path.join("db", "embedding_cache")
+
+
+def normalize_text(text):
+    """Normalize unicode and whitespace so trivially different copies share a key"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_key(text):
+    """Stable hash of the normalized text"""
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class EmbeddingCache:
+    """Size-bounded LRU cache of embeddings for one model, backed by a memory-mapped array"""
+
+    def __init__(self, model_name, cache_dir=CACHE_DIR, max_entries=200_000, dtype="float16",
+                 index_flush_seconds=30.0):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        # Rows beyond max_entries that new vectors can use while evicted slots wait for an index write
+        self.spare_slots = max(16, max_entries // 20)
+        self.dtype = np.dtype(dtype)
+        self.index_flush_seconds = index_flush_seconds
+
+        slug = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        os.makedirs(cache_dir, exist_ok=True)
+        self._vectors_path = os.path.join(cache_dir, f"{slug}.{self.dtype.name}.npy")
+        self._index_path = os.path.join(cache_dir, f"{slug}.{self.dtype.name}.index.json")
+
+        self._lock = threading.RLock()
+        self._vectors = None
+        self._index = OrderedDict()  # key -> slot, least recently used first
+        self._free_slots = []
+        self._released_slots = []  # evicted, but still referenced by the index on disk
+        self._next_slot = 0
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._load()
+        atexit.register(self.flush)
+
+    def _load(self):
+        if not (os.path.exists(self._vectors_path) and os.path.exists(self._index_path)):
+            return
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+            vectors = np.load(self._vectors_path, mmap_mode="r+")
+        except (OSError, ValueError):
+            # A corrupt cache is only a cache; start again
+            return
+        self._vectors = vectors
+        self._index = OrderedDict((key, slot) for key, slot in data["entries"])
+        self._next_slot = data["next_slot"]
+        used = set(self._index.values())
+        self._free_slots = [slot for slot in range(self._next_slot) if slot not in used]
+        # Honor a smaller max_entries than the cache was written with
+        while len(self._index) > self.max_entries:
+            self._evict()
+
+    def _ensure_capacity(self, dim):
+        if self._vectors is not None and self._vectors.shape[1] != dim:
+            raise ValueError(f"Cached vectors have dimension {self._vectors.shape[1]}, got {dim}")
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if self._next_slot < capacity:
+            return
+        # Grow geometrically instead of preallocating every row on disk
+        new_capacity = min(self.max_entries + self.spare_slots, max(1024, capacity * 2))
+        tmp_path = self._vectors_path + ".tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=self.dtype, shape=(new_capacity, dim))
+        if capacity:
+            grown[:capacity] = self._vectors
+            del self._vectors
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self._vectors_path)
+        self._vectors = np.load(self._vectors_path, mmap_mode="r+")
+
+    def _evict(self):
+        _, slot = self._index.popitem(last=False)
+        self._released_slots.append(slot)
+        self._dirty = True
+        self._stats["evictions"] += 1
+
+    def get_many(self, keys):
+        """Return cached float32 vectors (or None) for each key"""
+        results = []
+        with self._lock:
+            for key in keys:
+                slot = self._index.get(key)
+                if slot is None:
+                    self._stats["misses"] += 1
+                    results.append(None)
+                else:
+                    self._index.move_to_end(key)
+                    self._stats["hits"] += 1
+                    results.append(np.asarray(self._vectors[slot], dtype=np.float32))
+        return results
+
+    def put_many(self, keys, vectors):
+        """Store vectors, evicting the least recently used entries when full"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(keys) or self.max_entries <= 0:
+            return
+        with self._lock:
+            new = OrderedDict()
+            for key, vector in zip(keys, vectors):
+                if key in self._index:
+                    self._index.move_to_end(key)
+                else:
+                    new[key] = vector
+            # Anything before the last max_entries new keys would be evicted again straight away
+            new = list(new.items())[-self.max_entries:]
+            if not new:
+                return
+
+            while self._index and len(self._index) + len(new) > self.max_entries:
+                self._evict()
+            unused_rows = self.max_entries + self.spare_slots - self._next_slot
+            if len(self._free_slots) + unused_rows < len(new):
+                # The spare rows are used up; write the index once so the evicted slots can be reused
+                self.flush()
+
+            for key, vector in new:
+                if self._free_slots:
+                    slot = self._free_slots.pop()
+                else:
+                    self._ensure_capacity(vectors.shape[1])
+                    slot = self._next_slot
+                    self._next_slot += 1
+                self._vectors[slot] = vector
+                self._index[key] = slot
+            self._dirty = True
+
+    def flush(self, force=True):
+        """Write vectors and index to disk (rate-limited unless forced)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            if not force and time.monotonic() - self._last_flush < self.index_flush_seconds:
+                return
+            self._vectors.flush()
+            tmp_path = self._index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump({
+                    "model_name": self.model_name,
+                    "next_slot": self._next_slot,
+                    "entries": list(self._index.items()),
+                }, fh)
+            os.replace(tmp_path, self._index_path)
+            self._free_slots.extend(self._released_slots)
+            self._released_slots = []
+            self._dirty = False
+            self._last_flush = time.monotonic()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            stats["entries"] = len(self._index)
+            stats["max_entries"] = self.max_entries
+            stats["file_bytes"] = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+            return stats
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain embeddings wrapper that consults an EmbeddingCache first.
+
+    The wrapped model is only loaded on the first cache miss. Queries and documents
+    share entries, which is correct for models that embed both the same way
+    (all-MiniLM-L6-v2 does).
+    """
+
+    def __init__(self, cache, load_embeddings):
+        self.cache = cache
+        self._load_embeddings = load_embeddings
+        self._embeddings = None
+        self._load_lock = threading.Lock()
+
+    def _model(self):
+        with self._load_lock:
+            if self._embeddings is None:
+                self._embeddings = self._load_embeddings()
+            return self._embeddings
+
+    def _embed(self, texts, flush):
+        keys = [text_key(text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        # Embed each distinct missing text once, even if it repeats within the batch
+        missing = OrderedDict()
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        if missing:
+            fresh = self._model().embed_documents(list(missing.values()))
+            self.cache.put_many(list(missing), fresh)
+            fresh_by_key = dict(zip(missing, fresh))
+            vectors = [fresh_by_key[key] if vector is None else vector
+                       for key, vector in zip(keys, vectors)]
+            self.cache.flush(force=flush)
+        return [list(map(float, vector)) for vector in vectors]
+
+    def embed_documents(self, texts):
+        return self._embed(texts, flush=True)
+
+    def embed_query(self, text):
+        return self._embed([text], flush=False)[0]
+
+    def stats(self):
+        return self.cache.stats()
@@ -0,0 +1,245 @@
+"""
+ARCHITECT-GPT - Text Generation
+Created by: Levansh Bhan
+
+Model loading and generation helpers for the Gemma path. These are plain
+module-level functions so they can be used in-process by main.py or handed to
+the multi-worker pool in worker_pool.py.
+
+Speculative (assisted) decoding is opt-in with ARCHITECT_SPECULATIVE=1: a small
+draft model (ARCHITECT_DRAFT_MODEL, distilgpt2 by default) proposes a few tokens
+and Gemma verifies them all in a single forward pass. When the draft and target
+tokenizers differ, as distilgpt2 and Gemma do, transformers' universal assisted
+decoding re-tokenizes the proposals between the two vocabularies.
+"""
+
+import os
+import threading
+import time
+
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+
+GEMMA_MODEL = "google/gemma-2b"
+DRAFT_MODEL = "distilgpt2"
+MAX_PROMPT_TOKENS = 512
+TOKENIZER_PROBE = "Microservices communicate through well-defined APIs, e.g. REST or gRPC."
+
+# Draft model loaded next to Gemma when speculative decoding is enabled
+_assistant = None
+
+
+class GenerationStats:
+    """
+    Throughput and draft acceptance counters.
+
+    Every verification step runs the target model once and yields the accepted
+    draft tokens plus one token of its own, so accepted drafts are estimated as
+    generated tokens minus target forward passes, and proposed drafts as draft
+    forward passes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.generated_tokens = 0
+            self.target_forwards = 0
+            self.draft_forwards = 0
+            self.seconds = 0.0
+            self.fallbacks = 0
+
+    def record(self, generated_tokens, target_forwards, draft_forwards, seconds):
+        with self._lock:
+            self.calls += 1
+            self.generated_tokens += generated_tokens
+            self.target_forwards += target_forwards
+            self.draft_forwards += draft_forwards
+            self.seconds += seconds
+
+    def record_fallback(self):
+        with self._lock:
+            self.fallbacks += 1
+
+    def summary(self):
+        with self._lock:
+            accepted = max(0, self.generated_tokens - self.target_forwards)
+            return {
+                "calls": self.calls,
+                "generated_tokens": self.generated_tokens,
+                "tokens_per_second": self.generated_tokens / self.seconds if self.seconds else 0.0,
+                "tokens_per_target_forward": (self.generated_tokens / self.target_forwards
+                                              if self.target_forwards else 0.0),
+                "acceptance_rate": min(1.0, accepted / self.draft_forwards) if self.draft_forwards else 0.0,
+                "fallbacks": self.fallbacks,
+            }
+
+
+speculative_stats = GenerationStats()
+
+
+def load_causal_lm(model_name, token=None, torch_dtype=torch.float16, device_map="auto"):
+    """Load a tokenizer and causal LM with token authentication"""
+    tokenizer = AutoTokenizer.from_pretrained(
+        model_name,
+        token=token,
+        trust_remote_code=True
+    )
+
+    # Set pad token if not set
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    # safetensors checkpoints are memory-mapped while loading
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name,
+        token=token,
+        torch_dtype=torch_dtype,
+        device_map=device_map,
+        trust_remote_code=True,
+        use_safetensors=True
+    )
+    model.eval()
+    return model, tokenizer
+
+
+def tokenizers_compatible(tokenizer, other):
+    """True if both tokenizers share a vocabulary, so draft tokens can be verified directly"""
+    return (
+        len(tokenizer) == len(other)
+        and tokenizer.eos_token_id == other.eos_token_id
+        and tokenizer.encode(TOKENIZER_PROBE, add_special_tokens=False)
+        == other.encode(TOKENIZER_PROBE, add_special_tokens=False)
+    )
+
+
+def load_assistant(model, token=None, model_name=DRAFT_MODEL, num_assistant_tokens=5):
+    """Load a draft model on the target's device; returns (draft_model, draft_tokenizer)"""
+    draft, draft_tokenizer = load_causal_lm(model_name, token=token, torch_dtype=model.dtype, device_map=None)
+    draft.to(model.device)
+    draft.generation_config.num_assistant_tokens = num_assistant_tokens
+    return draft, draft_tokenizer
+
+
+def load_gemma(token=None):
+    """Load Google's Gemma model - much better for text generation"""
+    global _assistant
+    model, tokenizer = load_causal_lm(GEMMA_MODEL, token=token)
+    if os.getenv("ARCHITECT_SPECULATIVE", "0") == "1":
+        _assistant = load_assistant(
+            model,
+            token=token,
+            model_name=os.getenv("ARCHITECT_DRAFT_MODEL", DRAFT_MODEL),
+            num_assistant_tokens=int(os.getenv("ARCHITECT_DRAFT_TOKENS", "5")),
+        )
+    return model, tokenizer
+
+
+def build_gemma_prompt(query, context=None):
+    """Wrap a query, and optionally retrieved document context, in Gemma's chat template"""
+    if context:
+        query = f"Use this context from the knowledge base if it is relevant:\n{context}\n\nQuestion: {query}"
+    return f"""<start_of_turn>user
+{query}<end_of_turn>
+<start_of_turn>model
+"""
+
+
+def fit_context(tokenizer, query, context, max_prompt_tokens=MAX_PROMPT_TOKENS):
+    """Trim retrieved context so the wrapped prompt fits in `max_prompt_tokens` target-model tokens"""
+    if not context:
+        return context
+    budget = max_prompt_tokens - len(tokenizer.encode(build_gemma_prompt(query, " ")))
+    context_ids = tokenizer.encode(context, add_special_tokens=False)
+    if len(context_ids) <= budget:
+        return context
+    while budget > 0:
+        trimmed = tokenizer.decode(context_ids[:budget], skip_special_tokens=True)
+        # Re-encoding can merge tokens differently at the cut, so measure the real prompt
+        excess = len(tokenizer.encode(build_gemma_prompt(query, trimmed))) - max_prompt_tokens
+        if excess <= 0:
+            return trimmed
+        budget -= excess
+    # The question alone fills the prompt; answer it without context
+    return None
+
+
+def _count_forwards(module, counter, key):
+    # The model is shared by concurrent sessions; count only this thread's forward passes
+    thread = threading.get_ident()
+
+    def hook(*_):
+        if threading.get_ident() == thread:
+            counter[key] += 1
+    return module.register_forward_hook(hook)
+
+
+def generate_text(model, tokenizer, prompt, max_new_tokens=200, temperature=0.7, top_p=0.9,
+                  do_sample=True, assistant=None, stats=None):
+    """
+    Generate a completion for `prompt` and return only the new text.
+
+    `assistant` is an optional (draft_model, draft_tokenizer) pair for assisted
+    generation; `stats` is an optional GenerationStats to record into.
+    """
+    inputs = tokenizer.encode(prompt, return_tensors='pt')
+    if inputs.shape[-1] > MAX_PROMPT_TOKENS:
+        # Cut from the front so the question and the model turn marker survive; keep BOS
+        keep_bos = tokenizer.bos_token_id is not None and inputs[0, 0].item() == tokenizer.bos_token_id
+        inputs = torch.cat([inputs[:, :int(keep_bos)], inputs[:, -(MAX_PROMPT_TOKENS - int(keep_bos)):]], dim=-1)
+    inputs = inputs.to(model.device)
+    generate_kwargs = dict(
+        max_new_tokens=max_new_tokens,
+        temperature=temperature,
+        do_sample=do_sample,
+        top_p=top_p,
+        pad_token_id=tokenizer.eos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        attention_mask=torch.ones_like(inputs)
+    )
+    if assistant is not None:
+        draft, draft_tokenizer = assistant
+        generate_kwargs["assistant_model"] = draft
+        if not tokenizers_compatible(tokenizer, draft_tokenizer):
+            # Universal assisted decoding translates between the two vocabularies
+            generate_kwargs.update(tokenizer=tokenizer, assistant_tokenizer=draft_tokenizer)
+
+    counter = {"target": 0, "draft": 0}
+    hooks = [_count_forwards(model, counter, "target")]
+    if assistant is not None:
+        hooks.append(_count_forwards(assistant[0], counter, "draft"))
+    started = time.perf_counter()
+    try:
+        with torch.no_grad():
+            try:
+                outputs = model.generate(inputs, **generate_kwargs)
+            except (ValueError, NotImplementedError):
+                if assistant is None:
+                    raise
+                # This draft/target pairing is not supported for these settings; decode normally
+                for key in ("assistant_model", "tokenizer", "assistant_tokenizer"):
+                    generate_kwargs.pop(key, None)
+                counter.update(target=0, draft=0)
+                if stats is not None:
+                    stats.record_fallback()
+                outputs = model.generate(inputs, **generate_kwargs)
+    finally:
+        for hook in hooks:
+            hook.remove()
+
+    new_tokens = outputs[0][inputs.shape[-1]:]
+    if stats is not None:
+        stats.record(len(new_tokens), counter["target"], counter["draft"], time.perf_counter() - started)
+
+    # Decode only the generated part (drop the prompt tokens)
+    return tokenizer.decode(new_tokens, skip_special_tokens=True).strip()
+
+
+def generate_gemma(model, tokenizer, query, context=None, max_new_tokens=200):
+    """Answer a user query with a loaded Gemma model"""
+    context = fit_context(tokenizer, query, context)
+    return generate_text(model, tokenizer, build_gemma_prompt(query, context), max_new_tokens=max_new_tokens,
+                         assistant=_assistant, stats=speculative_stats if _assistant else None)
@@ -10,9 +10,10 @@ for contextual guidance and decision-making assistance.
 # Import necessary libraries
 import os
 import random
+import uuid
 import streamlit as st
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import SentenceTransformerEmbeddings
+from admission import AdmissionController, AdmissionRejected
+from vectorstore import DEFAULT_COLLECTION, get_vector_store, list_collections
 
 # Streamlit UI
 st.set_page_config(
@@ -21,6 +22,73 @@ st.set_page_config(
     layout="wide"
 )
 
+
+@st.cache_resource
+def get_admission_controller():
+    """One admission controller shared by every session on this server"""
+    return AdmissionController.from_env()
+
+
+@st.cache_resource
+def get_gemma_model(token):
+    """Load Gemma once per process instead of on every request"""
+    from generation import load_gemma
+    return load_gemma(token)
+
+
+@st.cache_resource
+def get_worker_pool(token):
+    """Start the multi-worker generation pool when ARCHITECT_WORKERS is set"""
+    from generation import load_gemma, generate_gemma
+    from worker_pool import GenerationWorkerPool
+    return GenerationWorkerPool.from_env(load_gemma, generate_gemma, loader_kwargs={"token": token})
+
+
+def retrieve_context(query, k=3):
+    """Fetch the most relevant chunks for a query from the selected knowledge base"""
+    try:
+        docs = get_vector_store(st.session_state.collection).similarity_search(query, k=k)
+    except Exception as e:
+        st.info(f"⚠️ Knowledge base unavailable: {str(e)[:100]}...")
+        return [], None
+    # generate_gemma trims this to the prompt's token budget with Gemma's own tokenizer
+    return docs, "\n\n".join(doc.page_content for doc in docs)
+
+
+admission = get_admission_controller()
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if "collection" not in st.session_state:
+    st.session_state.collection = DEFAULT_COLLECTION
+
+
+def admit_generation():
+    """Queue this session for a generation slot, showing its queue position"""
+    try:
+        ticket = admission.submit(st.session_state.session_id)
+    except AdmissionRejected as rejected:
+        st.warning(f"⚠️ {rejected.reason}")
+        st.info("💡 Using intelligent fallback responses...")
+        return None
+
+    queue_status = st.empty()
+
+    def show_position(position, waited):
+        queue_status.info(f"⏳ Queue position: {position} (waited {waited:.0f}s)")
+
+    try:
+        admitted = admission.acquire(ticket, on_wait=show_position)
+        queue_status.empty()
+    except BaseException:
+        # Streamlit stops a script on rerun by raising; never leave the ticket queued
+        admission.release(ticket)
+        raise
+    if not admitted:
+        st.info("⏳ AI models are busy right now - using intelligent fallback responses...")
+        return None
+    return ticket
+
+
 st.title("🏗️ ARCHITECT-GPT - Intelligent Architecture Assistant")
 st.write("**Created by: Levansh Bhan**")
 st.markdown("---")
@@ -40,6 +108,22 @@ with st.sidebar:
         st.info("Set HUGGINGFACE_API_TOKEN for full AI features")
         st.info("💡 Current: Using intelligent fallback responses")
 
+    # Each team or project queries only its own knowledge base
+    try:
+        collections = list_collections()
+    except Exception:
+        collections = []
+    if st.session_state.collection not in collections:
+        collections.append(st.session_state.collection)
+    collections = sorted(collections)
+    # Widget state is dropped on page switches, so the choice lives in session_state.collection
+    st.session_state.collection = st.selectbox(
+        "📚 Knowledge base", collections, index=collections.index(st.session_state.collection))
+
+    queue_stats = admission.stats()
+    st.caption(f"🚦 Generation slots in use: {queue_stats['active']}/{admission.max_concurrent} · "
+               f"queued: {queue_stats['queued']} · shed: {queue_stats['shed']}")
+
 # Main chat interface
 st.header("💬 Ask Your Technical Questions")
 
@@ -54,75 +138,52 @@ with col1:
             with st.spinner("🤖 Processing with AI..."):
                 try:
                     ai_response_successful = False
-                    # Try to use Hugging Face API if token is available
-                    if token:
+                    # Try to use Hugging Face API if token is available and we get a slot
+                    ticket = admit_generation() if token else None
+                    if ticket is not None:
                         try:
                             # Use Hugging Face transformers for real AI responses
                             from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
                             import torch
                             
                             # Try to use Google Gemma model with proper token authentication
+                            pool = None
                             try:
-                                # Use Google's Gemma model - much better for text generation
-                                model_name = "google/gemma-2b"
-                                
-                                # Load tokenizer and model with token authentication
-                                tokenizer = AutoTokenizer.from_pretrained(
-                                    model_name,
-                                    token=token,
-                                    trust_remote_code=True
-                                )
-                                
-                                # Set pad token if not set
-                                if tokenizer.pad_token is None:
-                                    tokenizer.pad_token = tokenizer.eos_token
-                                
-                                model = AutoModelForCausalLM.from_pretrained(
-                                    model_name,
-                                    token=token,
-                                    torch_dtype=torch.float16,
-                                    device_map="auto",
-                                    trust_remote_code=True
-                                )
-                                
-                                # Create a better prompt for Gemma
-                                prompt = f"""<start_of_turn>user
-{query}<end_of_turn>
-<start_of_turn>model
-"""
-                                
-                                inputs = tokenizer.encode(prompt, return_tensors='pt', truncation=True, max_length=512)
-                                
-                                # Generate response with Gemma
-                                with torch.no_grad():
-                                    outputs = model.generate(
-                                        inputs, 
-                                        max_new_tokens=200, 
-                                        temperature=0.7,
-                                        do_sample=True,
-                                        top_p=0.9,
-                                        pad_token_id=tokenizer.eos_token_id,
-                                        eos_token_id=tokenizer.eos_token_id,
-                                        attention_mask=torch.ones_like(inputs)
-                                    )
-                                
-                                # Decode the response
-                                full_response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-                                
-                                # Extract just the generated part (remove the prompt)
-                                response = full_response.replace(prompt, "").strip()
+                                # Use Google's Gemma model - much better for text generation,
+                                # served by the shared worker pool when multi-worker mode is on
+                                context_docs, context = retrieve_context(query)
+                                pool = get_worker_pool(token)
+                                if pool is not None:
+                                    response = pool.generate(query, context=context)
+                                else:
+                                    from generation import generate_gemma, speculative_stats
+                                    model, tokenizer = get_gemma_model(token)
+                                    response = generate_gemma(model, tokenizer, query, context=context)
+                                    if speculative_stats.calls:
+                                        spec = speculative_stats.summary()
+                                        # Running totals for this server process, not just this answer
+                                        st.caption(f"⚡ Speculative decoding, server average over {spec['calls']} answers: "
+                                                   f"{spec['tokens_per_second']:.1f} tokens/s, "
+                                                   f"draft acceptance {spec['acceptance_rate']:.0%}")
                                 
                                 # Clean up the response
                                 if response and len(response.strip()) > 10:
                                     st.success("✅ AI Response Generated with Google Gemma!")
                                     st.markdown("### 🤖 AI Response:")
                                     st.write(response)
+                                    if context_docs:
+                                        with st.expander("📚 Sources from your documents"):
+                                            for doc in context_docs:
+                                                st.write(f"• {doc.metadata.get('source', 'unknown')}")
                                     ai_response_successful = True
                                 else:
                                     raise Exception("Empty response from model")
                                     
                             except Exception as model_error:
                                 st.info(f"⚠️ Gemma model failed: {str(model_error)[:100]}...")
+                                if pool is not None:
+                                    # Multi-worker mode keeps models out of this process; don't load fallbacks here
+                                    raise model_error
                                 # Try alternative model
                                 try:
                                     st.info("🔄 Trying alternative model...")
@@ -245,6 +306,8 @@ with col1:
                         except Exception as e:
                             st.warning(f"⚠️ AI system failed: {str(e)}")
                             st.info("💡 Using intelligent fallback responses...")
+                        finally:
+                            admission.release(ticket)
                     
                     # Fallback intelligent responses (only if AI didn't work)
                     if not ai_response_successful:
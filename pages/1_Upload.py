@@ -5,19 +5,17 @@ Created by: Levansh Bhan
 This advanced module handles sophisticated document upload, processing, and embedding
 for the ARCHITECT-GPT assistant. It supports PDF, TXT, and DOCX files and stores them
 in a high-performance Chroma vector database for intelligent retrieval and analysis.
+Each team or project uploads into its own knowledge base (Chroma collection).
 """
 
 # Import necessary libraries
 import streamlit as st
-from langchain_community.document_loaders import TextLoader
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_community.vectorstores import Chroma
+from chunking import chunk_documents, chunk_settings, document_type, load_documents
+from vectorstore import (DEFAULT_COLLECTION, collection_stats, get_embeddings, get_vector_store,
+                         list_collections, normalize_collection_name)
 import os
 
 # Directories
-chromadb = "db"
 upload_folder = "upload"
 os.makedirs(upload_folder, exist_ok=True)
 
@@ -31,42 +29,74 @@ st.title("📄 Document Upload & Processing")
 st.write("**Created by: Levansh Bhan**")
 st.markdown("---")
 
+if "collection" not in st.session_state:
+    st.session_state.collection = DEFAULT_COLLECTION
+# Uploaded file id -> knowledge base it was embedded into; the uploader keeps its file across reruns
+if "processed_uploads" not in st.session_state:
+    st.session_state.processed_uploads = {}
+
+
+def select_collection():
+    """Pick the knowledge base to upload into, or create a new one"""
+    try:
+        collections = list_collections()
+    except Exception:
+        collections = []
+    if st.session_state.collection not in collections:
+        collections.append(st.session_state.collection)
+    collections = sorted(collections)
+    col_select, col_new = st.columns(2)
+    with col_select:
+        selected = st.selectbox("📚 Knowledge base", collections,
+                                index=collections.index(st.session_state.collection))
+    with col_new:
+        new_name = st.text_input("➕ New knowledge base", placeholder="e.g., payments-team")
+    if new_name:
+        try:
+            selected = normalize_collection_name(new_name)
+        except ValueError as e:
+            st.warning(f"⚠️ {e}")
+    st.session_state.collection = selected
+    return selected
+
+collection = select_collection()
+
 def upload_documents():
-    uploaded_file = st.file_uploader("Upload new documents for embedding", type=["pdf", "txt", "docx"])
+    uploaded_file = st.file_uploader("Upload new documents for embedding", type=["pdf", "txt", "md", "docx"])
     if uploaded_file is not None:
+        upload_key = uploaded_file.file_id
+        if upload_key in st.session_state.processed_uploads:
+            # Changing the knowledge base reruns the page; don't embed the same upload again
+            st.info(f"✅ {uploaded_file.name} was added to the **{st.session_state.processed_uploads[upload_key]}** "
+                    f"knowledge base. Upload it again to add it to another one.")
+            return None, None
         # Get the file name
         filename = os.path.join(upload_folder, uploaded_file.name)
         with open(filename, 'wb') as f:
             f.write(uploaded_file.read())
-        return filename
-    return None
+        return filename, upload_key
+    return None, None
 
-uploaded_document = upload_documents()
+uploaded_document, upload_key = upload_documents()
 
 if uploaded_document:
     with st.spinner("🔄 Processing document..."):
         try:
-            # Load documents
-            def is_pdf(file_path):
-                file_extension = os.path.splitext(file_path)[-1].lower()
-                return file_extension == '.pdf'
-
+            # Load documents and split them into token-sized chunks along headings, paragraphs and tables
             file_path = uploaded_document
+            doc_type = document_type(file_path)
+            settings = chunk_settings(doc_type)
 
-            if is_pdf(file_path):
-                st.info(f'📄 Processing PDF file: {uploaded_file.name}')
-                documents = PyPDFLoader(file_path=uploaded_document)
-                text_chunks = documents.load_and_split()
-            else:
-                st.info(f'📄 Processing text file: {uploaded_file.name}')
-                documents = TextLoader(uploaded_document).load()
-                text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-                text_chunks = text_splitter.split_documents(documents)
-
-            # Embed text chunks
+            st.info(f'📄 Processing {doc_type.upper()} file: {os.path.basename(file_path)} → 📚 {collection}')
+            documents = load_documents(file_path)
+            text_chunks = chunk_documents(documents, doc_type)
+            st.info(f"✂️ Split into {len(text_chunks)} chunks of up to {settings['chunk_tokens']} tokens")
+
+            # Embed text chunks; the shared writer batches this with other sessions' uploads
             with st.spinner("🤖 Creating embeddings..."):
-                embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-                vectorstore = Chroma.from_documents(documents=text_chunks, embedding=embeddings, persist_directory=chromadb)
+                vectorstore = get_vector_store(collection)
+                vectorstore.add_documents(text_chunks).result()
+            st.session_state.processed_uploads[upload_key] = collection
             
             st.success("✅ Document processed and embeddings stored in the vector database!")
             
@@ -76,15 +106,14 @@ if uploaded_document:
 
 # Show contents of the Vector Database
 try:
-    client = Chroma(persist_directory=chromadb)
-    dblist = client.get()
+    dblist = get_vector_store(collection).get()
     
     if dblist['metadatas']:
         embedded_docs = [item['source'] for item in dblist['metadatas']]
         
         st.markdown("---")
         st.subheader("📚 Stored Documents")
-        st.write("Documents currently in the knowledge base:")
+        st.write(f"Documents currently in the **{collection}** knowledge base:")
         
         for i, doc in enumerate(embedded_docs, 1):
             st.write(f"{i}. {doc}")
@@ -94,6 +123,17 @@ try:
 except Exception as e:
     st.warning("⚠️ Could not retrieve stored documents.")
 
+# Writer batching and lock contention for this server process
+with st.expander("📊 Vector Database Metrics"):
+    try:
+        st.json(get_vector_store(collection).metrics())
+        st.markdown("**Knowledge bases**")
+        st.dataframe(collection_stats(), use_container_width=True)
+        st.markdown("**Embedding cache**")
+        st.json(get_embeddings().stats())
+    except Exception as e:
+        st.warning("⚠️ Could not retrieve vector database metrics.")
+
 # Information section
 with st.expander("📖 How Document Processing Works"):
     st.markdown("""
@@ -101,13 +141,14 @@ with st.expander("📖 How Document Processing Works"):
     
     1. **Upload**: Select PDF, TXT, or DOCX files
     2. **Extraction**: Extract text content from documents
-    3. **Chunking**: Split text into smaller, manageable chunks
+    3. **Chunking**: Split text into token-sized chunks along headings, paragraphs and tables
     4. **Embedding**: Convert text chunks into vector representations
     5. **Storage**: Store vectors in Chroma database for retrieval
     
     ### Supported Formats:
     - **PDF**: Full text extraction with page information
     - **TXT**: Plain text files
+    - **MD**: Markdown files (headings are kept with their sections)
     - **DOCX**: Microsoft Word documents
     
     ### Benefits:
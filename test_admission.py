@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for admission control (admission.py)
+
+Run with: python -m pytest -q test_admission.py
+"""
+
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController
+
+
+class StopScript(BaseException):
+    """Stands in for the exception Streamlit raises to stop or rerun a script"""
+
+
+def test_abandoned_ticket_does_not_block_queue():
+    """A caller that stops inside acquire() must not wedge everyone queued behind it"""
+    admission = AdmissionController(max_concurrent=1, max_queue=4, rate_per_minute=600, burst=10,
+                                    max_wait_seconds=0.5)
+    holder = admission.submit("holder")
+    assert admission.acquire(holder)
+
+    def stop(position, waited):
+        raise StopScript()
+
+    abandoned = admission.submit("abandoned")
+    with pytest.raises(StopScript):
+        admission.acquire(abandoned, on_wait=stop, poll_seconds=0.01)
+    assert admission.stats()["queued"] == 1
+
+    time.sleep(0.6)  # the abandoned ticket is past its wait limit but still at the head
+    waiting = admission.submit("waiting")
+    threading.Timer(0.1, admission.release, args=(holder,)).start()
+    admitted = admission.acquire(waiting, poll_seconds=0.01)
+    stats = admission.stats()
+    assert admitted
+    assert stats["queued"] == 0
+    assert stats["shed"] == 1
+    admission.release(waiting)
+
+
+def test_quiet_sessions_are_forgotten():
+    admission = AdmissionController(rate_per_minute=6000, burst=1, history_seconds=0.05)
+    for i in range(6):
+        admission.release(admission.submit(f"session-{i}"))
+    time.sleep(0.1)
+    admission.release(admission.submit("active"))
+    assert list(admission._buckets) == ["active"]
+    assert list(admission._history) == ["active"]
+
+
+def test_in_process_mode_has_one_slot(monkeypatch):
+    monkeypatch.delenv("ARCHITECT_MAX_CONCURRENT", raising=False)
+    monkeypatch.setenv("ARCHITECT_WORKERS", "0")
+    assert AdmissionController.from_env().max_concurrent == 1
+    monkeypatch.setenv("ARCHITECT_WORKERS", "4")
+    assert AdmissionController.from_env().max_concurrent == 4
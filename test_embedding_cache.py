@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for the embedding cache (embedding_cache.py)
+
+Run with: python -m pytest -q test_embedding_cache.py
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from embedding_cache import EmbeddingCache
+
+
+def reopen(cache):
+    """Open the same files again without flushing, as after a crash"""
+    return EmbeddingCache(cache.model_name, cache_dir=os.path.dirname(cache._index_path),
+                          max_entries=cache.max_entries, dtype=cache.dtype.name)
+
+
+def test_evicted_slot_not_reused_before_index_is_written(tmp_path):
+    cache = EmbeddingCache("model", cache_dir=str(tmp_path), max_entries=2, dtype="float32")
+    cache.put_many(["a", "b"], [[1, 0], [2, 0]])
+    cache.flush()
+    slot_a = cache._index["a"]
+
+    cache.put_many(["c"], [[9, 9]])  # evicts "a"; the index on disk still points at its slot
+    assert "a" not in cache._index
+    assert cache._index["c"] != slot_a
+
+    a, b, c = reopen(cache).get_many(["a", "b", "c"])
+    assert np.array_equal(a, [1, 0])  # never another text's vector
+    assert np.array_equal(b, [2, 0])
+    assert c is None
+
+
+def test_full_cache_flushes_once_per_spare_block(tmp_path):
+    cache = EmbeddingCache("model", cache_dir=str(tmp_path), max_entries=1000, dtype="float32")
+    cache.put_many([f"old-{i}" for i in range(1000)], np.ones((1000, 4)))
+    cache.flush()
+
+    flushes = []
+    flush = cache.flush
+    cache.flush = lambda force=True: (flushes.append(force), flush(force))
+
+    for i in range(500):
+        cache.put_many([f"new-{i}"], [[i, 0, 0, 0]])
+    cache.put_many([f"batch-{i}" for i in range(300)], np.full((300, 4), 7.0))
+
+    assert len(flushes) <= 500 // cache.spare_slots + 1
+    assert len(cache._index) == 1000
+    assert cache._next_slot <= cache.max_entries + cache.spare_slots
+    assert np.array_equal(cache.get_many(["new-499"])[0], [499, 0, 0, 0])
+    assert np.array_equal(cache.get_many(["batch-0"])[0], [7, 7, 7, 7])
+
+    cache.flush()
+    reopened = reopen(cache)
+    assert np.array_equal(reopened.get_many(["new-499"])[0], [499, 0, 0, 0])
+    assert reopened.get_many(["old-0"]) == [None]
@@ -0,0 +1,187 @@
+"""
+ARCHITECT-GPT - Vector Compression
+Created by: Levansh Bhan
+
+Compressed copies of the knowledge-base vectors for first-stage search. Vectors
+are stored as float16 (half the size of float32) or as int8 codes with one scale
+per dimension (a quarter of the size). A search scans the compressed codes for a
+larger candidate set and re-scores those candidates exactly against a float32
+copy of the vectors that is memory-mapped from disk, so only the pages of the
+candidates are read and recall stays close to exact search.
+
+Indexes are written by compact_db.py and live in db/compressed/<collection>/,
+together with a fingerprint of the chunk ids they cover so a store can tell
+whether the collection changed since the index was built.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+COMPRESSION_MODES = ("float16", "int8")
+SCAN_BLOCK_ROWS = 16384
+
+
+def index_dir(persist_directory, collection_name):
+    """Where the compressed index for a collection is stored"""
+    return os.path.join(persist_directory, "compressed", collection_name)
+
+
+def fingerprint(ids):
+    """Order-independent hash of a set of chunk ids"""
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk_id in sorted(ids):
+        digest.update(chunk_id.encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+def distances(query, vectors, metric):
+    """Distance from `query` to each row of `vectors` (smaller is closer), matching Chroma's spaces"""
+    if metric == "ip":
+        return 1.0 - vectors @ query
+    if metric == "cosine":
+        norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+        return 1.0 - (vectors @ query) / np.where(norms == 0, 1.0, norms)
+    return np.sum((vectors - query) ** 2, axis=1)
+
+
+def top_k(query, vectors, k, metric="l2"):
+    """Indices of the k closest rows, closest first"""
+    dist = distances(np.asarray(query, dtype=np.float32), np.asarray(vectors, dtype=np.float32), metric)
+    return _smallest(dist, k)
+
+
+def _smallest(dist, k):
+    k = min(k, len(dist))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    nearest = np.argpartition(dist, k - 1)[:k]
+    return nearest[np.argsort(dist[nearest])]
+
+
+class CompressedIndex:
+    """Flat index over float16 or int8-quantized vectors, with a float32 copy for re-scoring"""
+
+    def __init__(self, ids, codes, mode, metric="l2", scale=None, norms=None, vectors=None, ids_fingerprint=None):
+        if mode not in COMPRESSION_MODES:
+            raise ValueError(f"Unknown compression mode {mode!r}; expected one of {COMPRESSION_MODES}")
+        self.ids = list(ids)
+        self.codes = codes
+        self.mode = mode
+        self.metric = metric
+        self.scale = scale
+        self.norms = norms if norms is not None else self._decoded_norms()
+        self.vectors = vectors
+        self.fingerprint = ids_fingerprint or fingerprint(self.ids)
+
+    @classmethod
+    def build(cls, ids, vectors, mode, metric="l2"):
+        """Compress float32 vectors"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if mode == "float16":
+            return cls(ids, vectors.astype(np.float16), mode, metric, vectors=vectors)
+        if mode == "int8":
+            # Symmetric per-dimension scaling keeps each dimension's full range
+            scale = np.abs(vectors).max(axis=0) / 127.0 if len(vectors) else np.ones(vectors.shape[1])
+            scale = np.where(scale == 0, 1.0, scale).astype(np.float32)
+            codes = np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+            return cls(ids, codes, mode, metric, scale, vectors=vectors)
+        raise ValueError(f"Unknown compression mode {mode!r}; expected one of {COMPRESSION_MODES}")
+
+    @property
+    def size(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        """Bytes a search keeps in memory: codes, scales and row norms"""
+        return self.codes.nbytes + self.norms.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def decode(self, start=0, stop=None):
+        """Approximate float32 vectors for a range of rows"""
+        block = np.asarray(self.codes[start:stop], dtype=np.float32)
+        if self.scale is not None:
+            block *= self.scale
+        return block
+
+    def _decoded_norms(self):
+        return np.concatenate([np.linalg.norm(self.decode(start, start + SCAN_BLOCK_ROWS), axis=1)
+                               for start in range(0, self.size, SCAN_BLOCK_ROWS)] or [np.zeros(0)]
+                              ).astype(np.float32)
+
+    def _search_rows(self, query, k):
+        query = np.asarray(query, dtype=np.float32)
+        # Fold the int8 scales into the query so each block is a single cast and matrix-vector product
+        scaled = query * self.scale if self.scale is not None else query
+        best_rows = np.array([], dtype=np.int64)
+        best_dist = np.array([], dtype=np.float32)
+        for start in range(0, self.size, SCAN_BLOCK_ROWS):
+            dots = self.codes[start:start + SCAN_BLOCK_ROWS].astype(np.float32) @ scaled
+            norms = self.norms[start:start + len(dots)]
+            if self.metric == "ip":
+                dist = 1.0 - dots
+            elif self.metric == "cosine":
+                dist = 1.0 - dots / np.where(norms == 0, 1.0, norms)
+            else:
+                # |v - q|^2 without the |q|^2 term, which is the same for every row
+                dist = norms * norms - 2.0 * dots
+            keep = _smallest(dist, k)
+            best_rows = np.concatenate([best_rows, keep + start])
+            best_dist = np.concatenate([best_dist, dist[keep]])
+            if len(best_rows) > k:
+                keep = np.argpartition(best_dist, k - 1)[:k]
+                best_rows, best_dist = best_rows[keep], best_dist[keep]
+        return best_rows[np.argsort(best_dist)]
+
+    def search(self, query, k):
+        """Ids of the k closest vectors by approximate distance, closest first"""
+        return [self.ids[row] for row in self._search_rows(query, k)]
+
+    def search_rescored(self, query, k, rescore_factor=4):
+        """Scan for k * rescore_factor candidates, then return the k closest ids by exact float32 distance"""
+        if self.vectors is None:
+            raise ValueError("This index has no float32 vectors for re-scoring")
+        rows = np.sort(self._search_rows(query, k * rescore_factor))
+        best = top_k(query, self.vectors[rows], k, self.metric)
+        return [self.ids[rows[i]] for i in best]
+
+    def save(self, directory):
+        """Write codes, norms and float32 vectors as .npy (memory-mappable on load) plus a JSON header"""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "codes.npy"), self.codes)
+        np.save(os.path.join(directory, "norms.npy"), self.norms)
+        if self.vectors is not None:
+            np.save(os.path.join(directory, "vectors.npy"), np.asarray(self.vectors, dtype=np.float32))
+        if self.scale is not None:
+            np.save(os.path.join(directory, "scale.npy"), self.scale)
+        with open(os.path.join(directory, "index.json"), "w", encoding="utf-8") as fh:
+            json.dump({"mode": self.mode, "metric": self.metric, "fingerprint": self.fingerprint,
+                       "ids": self.ids}, fh)
+
+    @classmethod
+    def load(cls, directory):
+        """Load a saved index, memory-mapping its arrays; returns None if there is none"""
+        header_path = os.path.join(directory, "index.json")
+        if not os.path.exists(header_path):
+            return None
+        with open(header_path, "r", encoding="utf-8") as fh:
+            header = json.load(fh)
+
+        def optional(name, mmap_mode="r"):
+            path = os.path.join(directory, name)
+            return np.load(path, mmap_mode=mmap_mode) if os.path.exists(path) else None
+
+        # Codes and norms are scanned on every query, so they are read into memory
+        codes = np.load(os.path.join(directory, "codes.npy"))
+        return cls(header["ids"], codes, header["mode"], header["metric"], scale=optional("scale.npy", None),
+                   norms=optional("norms.npy", None), vectors=optional("vectors.npy"),
+                   ids_fingerprint=header.get("fingerprint"))
+
+
+def recall_at_k(exact, approximate):
+    """Mean fraction of the exact top-k ids that the approximate search also returned"""
+    if not exact:
+        return 1.0
+    return float(np.mean([len(set(e) & set(a)) / len(e) if e else 1.0 for e, a in zip(exact, approximate)]))
@@ -0,0 +1,394 @@
+"""
+ARCHITECT-GPT - Vector Store Access Layer
+Created by: Levansh Bhan
+
+Single point of access to the Chroma vector database for every Streamlit session
+in this process. All sessions share one Chroma client, inserts from concurrent
+uploads go through one writer thread that batches them into larger writes, and
+queries run under a read lock so they never observe half of a batch. Lock waits
+are recorded so contention shows up in the metrics rather than as slow pages.
+
+Each team or project gets its own named collection (knowledge base), so a query
+only searches that tenant's chunks. Collections are opened on first use and
+closed again after ARCHITECT_COLLECTION_IDLE_SECONDS without use, which stops
+their writer thread. Their vector indexes are unloaded by Chroma's LRU segment
+cache, which keeps at most ARCHITECT_CHROMA_MEMORY_LIMIT bytes (1 GiB by default)
+of indexes in memory; with the limit set to 0 idle indexes stay loaded.
+"""
+
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import chromadb
+from langchain_core.documents import Document
+from langchain_community.embeddings import SentenceTransformerEmbeddings
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from vector_compression import CompressedIndex, fingerprint, index_dir
+
+CHROMA_DIR = "db"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_COLLECTION = "langchain"  # LangChain's default, so existing databases keep working
+DEFAULT_CHROMA_MEMORY_LIMIT = 1024 ** 3  # bytes of collection indexes Chroma keeps loaded
+COLLECTION_NAME_PATTERN = re.compile(r"^[a-z0-9][a-z0-9._-]{1,61}[a-z0-9]$")
+
+
+class ReadWriteLock:
+    """Writer-preferring readers/writer lock that records how long callers wait"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+        self._metrics = {
+            "read_acquires": 0,
+            "read_wait_seconds": 0.0,
+            "read_max_wait_seconds": 0.0,
+            "write_acquires": 0,
+            "write_wait_seconds": 0.0,
+            "write_max_wait_seconds": 0.0,
+        }
+
+    def _record(self, kind, waited):
+        self._metrics[f"{kind}_acquires"] += 1
+        self._metrics[f"{kind}_wait_seconds"] += waited
+        self._metrics[f"{kind}_max_wait_seconds"] = max(self._metrics[f"{kind}_max_wait_seconds"], waited)
+
+    @contextmanager
+    def read(self):
+        started = time.perf_counter()
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+            self._record("read", time.perf_counter() - started)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        started = time.perf_counter()
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+            self._record("write", time.perf_counter() - started)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+    def metrics(self):
+        with self._cond:
+            return dict(self._metrics)
+
+
+class VectorStore:
+    """One Chroma collection with a serialized, batching writer and locked reads"""
+
+    def __init__(self, client, collection_name, embeddings, persist_directory=CHROMA_DIR,
+                 max_batch_docs=1024, batch_window=0.25, compressed_search=False, rescore_factor=4,
+                 compressed_max_rows=250_000, stats=None):
+        self.collection_name = collection_name
+        self.persist_directory = persist_directory
+        self.rescore_factor = rescore_factor
+        self.max_batch_docs = max_batch_docs
+        self.batch_window = batch_window
+        self._client = client
+        self._collection = client.get_or_create_collection(collection_name)
+        self._embeddings = embeddings
+        self._lock = ReadWriteLock()
+        self._pending = queue.Queue()
+        self._compressed = self._load_compressed(compressed_max_rows) if compressed_search else None
+        # Counters live in the registry so they survive the store being evicted and reopened
+        self._stats = stats if stats is not None else new_collection_stats()
+        self._stats_lock = threading.Lock()
+        self._closed = False
+        self.last_used = time.monotonic()
+        self._writer = threading.Thread(target=self._writer_loop, name=f"chroma-writer-{collection_name}",
+                                        daemon=True)
+        self._writer.start()
+
+    def _load_compressed(self, max_rows, page_size=5000):
+        """The compacted index, if it still covers exactly this collection's chunks"""
+        index = CompressedIndex.load(index_dir(self.persist_directory, self.collection_name))
+        # A flat scan costs time linear in the rows; past max_rows Chroma's HNSW search is faster
+        if index is None or index.vectors is None or index.size > max_rows:
+            return None
+        ids = []
+        for offset in range(0, self._collection.count(), page_size):
+            ids.extend(self._collection.get(include=[], limit=page_size, offset=offset)["ids"])
+        return index if fingerprint(ids) == index.fingerprint else None
+
+    def add_documents(self, documents):
+        """Queue documents for insertion; returns a Future with their ids once committed"""
+        if self._closed:
+            raise RuntimeError(f"Collection '{self.collection_name}' was closed; reopen it with get_vector_store()")
+        self.last_used = time.monotonic()
+        future = Future()
+        self._pending.put((list(documents), future))
+        return future
+
+    def is_idle(self):
+        """True when no writes are queued or in progress"""
+        return self._pending.unfinished_tasks == 0
+
+    def close(self):
+        """Stop the writer thread once queued writes are done"""
+        self._closed = True
+        self._pending.put(None)
+
+    def _writer_loop(self):
+        while True:
+            first = self._pending.get()
+            if first is None:
+                self._pending.task_done()
+                self._fail_pending()
+                return
+            batch = [first]
+            queued_docs = len(batch[0][0])
+            deadline = time.monotonic() + self.batch_window
+            # Give concurrent uploads a moment to join this batch
+            while queued_docs < self.max_batch_docs:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    # Close requested: finish this batch, then stop
+                    self._pending.task_done()
+                    self._pending.put(None)
+                    break
+                batch.append(item)
+                queued_docs += len(item[0])
+            self._write_batch(batch)
+            for _ in batch:
+                self._pending.task_done()
+
+    def _fail_pending(self):
+        # Writes that raced with close() would otherwise wait forever
+        while True:
+            try:
+                item = self._pending.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item[1].set_exception(RuntimeError(f"Collection '{self.collection_name}' was closed"))
+            self._pending.task_done()
+
+    def _write_batch(self, batch):
+        documents = [doc for docs, _ in batch for doc in docs]
+        ids = [str(uuid.uuid4()) for _ in documents]
+        try:
+            # Embed outside the lock; only the actual write blocks readers
+            texts = [doc.page_content for doc in documents]
+            embeddings = self._embeddings.embed_documents(texts) if texts else []
+            metadatas = [doc.metadata or {"source": "unknown"} for doc in documents]
+            step = self._client.get_max_batch_size()
+            with self._lock.write():
+                # New chunks are not in the compacted index; search through Chroma until the next compaction
+                self._compressed = None
+                for start in range(0, len(documents), step):
+                    self._collection.upsert(
+                        ids=ids[start:start + step],
+                        embeddings=embeddings[start:start + step],
+                        documents=texts[start:start + step],
+                        metadatas=metadatas[start:start + step],
+                    )
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._stats_lock:
+            self._stats["write_requests"] += len(batch)
+            self._stats["write_batches"] += 1
+            self._stats["documents_written"] += len(documents)
+        offset = 0
+        for docs, future in batch:
+            future.set_result(ids[offset:offset + len(docs)])
+            offset += len(docs)
+
+    def similarity_search(self, query, k=4):
+        """Return the k stored chunks closest to `query` as LangChain Documents"""
+        self.last_used = time.monotonic()
+        started = time.perf_counter()
+        query_embedding = self._embeddings.embed_query(query)
+        index = self._compressed
+        if index is not None:
+            texts, metadatas = self._compressed_search(index, query_embedding, k)
+        else:
+            with self._lock.read():
+                result = self._collection.query(query_embeddings=[query_embedding], n_results=k,
+                                                include=["documents", "metadatas"])
+            texts, metadatas = result["documents"][0], result["metadatas"][0]
+        compressed = index is not None
+        with self._stats_lock:
+            self._stats["queries"] += 1
+            self._stats["compressed_queries"] += compressed
+            self._stats["query_seconds"] += time.perf_counter() - started
+        return [
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(texts, metadatas)
+        ]
+
+    def _compressed_search(self, index, query_embedding, k):
+        # The index is immutable, so the scan and re-scoring run without blocking the writer
+        best_ids = index.search_rescored(query_embedding, k, self.rescore_factor)
+        with self._lock.read():
+            result = self._collection.get(ids=best_ids, include=["documents", "metadatas"])
+        rows = {chunk_id: i for i, chunk_id in enumerate(result["ids"])}
+        found = [rows[chunk_id] for chunk_id in best_ids if chunk_id in rows]
+        return [result["documents"][i] for i in found], [result["metadatas"][i] for i in found]
+
+    def get(self, include=("metadatas",)):
+        """Consistent snapshot of the stored records"""
+        self.last_used = time.monotonic()
+        with self._lock.read():
+            return self._collection.get(include=list(include))
+
+    def count(self):
+        with self._lock.read():
+            return self._collection.count()
+
+    def metrics(self):
+        """Write batching counters plus lock-wait metrics"""
+        with self._stats_lock:
+            metrics = dict(self._stats)
+        metrics["pending_writes"] = self._pending.qsize()
+        metrics["avg_query_ms"] = 1000 * metrics["query_seconds"] / metrics["queries"] if metrics["queries"] else 0.0
+        metrics.update(self._lock.metrics())
+        return metrics
+
+
+_clients = {}
+_stores = {}
+_collection_stats = {}
+_embeddings = None
+_registry_lock = threading.Lock()
+
+
+def new_collection_stats():
+    return {"write_requests": 0, "write_batches": 0, "documents_written": 0, "queries": 0,
+            "compressed_queries": 0, "query_seconds": 0.0, "loads": 0, "evictions": 0}
+
+
+def normalize_collection_name(name):
+    """Turn a team or project name into a valid Chroma collection name"""
+    slug = re.sub(r"[^a-z0-9._-]+", "-", name.strip().lower()).strip("._-")[:63]
+    if not COLLECTION_NAME_PATTERN.match(slug):
+        raise ValueError("Knowledge base names need 3-63 letters, digits, '.', '_' or '-'")
+    return slug
+
+
+def get_embeddings():
+    """Cached sentence-transformer embeddings, shared by uploads and queries in this process"""
+    global _embeddings
+    with _registry_lock:
+        if _embeddings is None:
+            cache = EmbeddingCache(
+                EMBEDDING_MODEL,
+                max_entries=int(os.getenv("ARCHITECT_EMBEDDING_CACHE_SIZE", "200000")),
+                dtype=os.getenv("ARCHITECT_EMBEDDING_CACHE_DTYPE", "float16"),
+            )
+            _embeddings = CachedEmbeddings(cache, lambda: SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL))
+        return _embeddings
+
+
+def get_client(persist_directory=CHROMA_DIR):
+    """The process-wide Chroma client for a database directory"""
+    with _registry_lock:
+        if persist_directory not in _clients:
+            kwargs = {}
+            memory_limit = int(os.getenv("ARCHITECT_CHROMA_MEMORY_LIMIT", str(DEFAULT_CHROMA_MEMORY_LIMIT)))
+            if memory_limit:
+                # Let Chroma unload the indexes of collections nobody is querying
+                kwargs["settings"] = chromadb.Settings(chroma_segment_cache_policy="LRU",
+                                                       chroma_memory_limit_bytes=memory_limit)
+            _clients[persist_directory] = chromadb.PersistentClient(path=persist_directory, **kwargs)
+        return _clients[persist_directory]
+
+
+def evict_idle(max_idle_seconds=None):
+    """Close collections that have not been used for `max_idle_seconds`"""
+    if max_idle_seconds is None:
+        max_idle_seconds = float(os.getenv("ARCHITECT_COLLECTION_IDLE_SECONDS", "900"))
+    now = time.monotonic()
+    with _registry_lock:
+        for key, store in list(_stores.items()):
+            if now - store.last_used > max_idle_seconds and store.is_idle():
+                del _stores[key]
+                store.close()
+                _collection_stats[key]["evictions"] += 1
+
+
+def get_vector_store(collection_name=DEFAULT_COLLECTION, persist_directory=CHROMA_DIR):
+    """The shared VectorStore for a collection, opened on first use"""
+    evict_idle()
+    key = (persist_directory, collection_name)
+    store = _stores.get(key)
+    if store is None:
+        client = get_client(persist_directory)
+        embeddings = get_embeddings()
+        with _registry_lock:
+            store = _stores.get(key)
+            if store is None:
+                stats = _collection_stats.setdefault(key, new_collection_stats())
+                stats["loads"] += 1
+                store = _stores[key] = VectorStore(
+                    client, collection_name, embeddings, persist_directory=persist_directory,
+                    compressed_search=os.getenv("ARCHITECT_COMPRESSED_SEARCH", "0") == "1",
+                    rescore_factor=int(os.getenv("ARCHITECT_RESCORE_FACTOR", "4")),
+                    compressed_max_rows=int(os.getenv("ARCHITECT_COMPRESSED_MAX_ROWS", "250000")),
+                    stats=stats,
+                )
+    store.last_used = time.monotonic()
+    return store
+
+
+def list_collections(persist_directory=CHROMA_DIR):
+    """Names of all knowledge bases in the database"""
+    collections = get_client(persist_directory).list_collections()
+    # Chroma 0.6+ returns names, older versions return Collection objects
+    return sorted(c if isinstance(c, str) else c.name for c in collections)
+
+
+def collection_stats(persist_directory=CHROMA_DIR):
+    """Per-collection size, load state and query/write counters"""
+    client = get_client(persist_directory)
+    now = time.monotonic()
+    rows = []
+    for name in list_collections(persist_directory):
+        key = (persist_directory, name)
+        store = _stores.get(key)
+        stats = dict(_collection_stats.get(key) or new_collection_stats())
+        rows.append({
+            "collection": name,
+            "chunks": client.get_collection(name).count(),
+            "loaded": store is not None,
+            "idle_seconds": round(now - store.last_used) if store is not None else None,
+            "queries": stats["queries"],
+            "avg_query_ms": round(1000 * stats["query_seconds"] / stats["queries"], 1) if stats["queries"] else 0.0,
+            "documents_written": stats["documents_written"],
+            "loads": stats["loads"],
+            "evictions": stats["evictions"],
+        })
+    return rows
@@ -0,0 +1,227 @@
+"""
+ARCHITECT-GPT - Multi-Worker Generation Pool
+Created by: Levansh Bhan
+
+Runs generation in N worker processes that share one copy of the model weights.
+
+A fresh (spawned, single-threaded) pool master loads the model once, freezes the
+garbage collector so the loaded objects are never written to again, and then
+forks the workers. The weights are inherited copy-on-write, so every worker reads
+the same physical pages and total memory grows far slower than N full copies.
+Each worker runs its own interpreter, so generation is no longer bounded by the
+GIL of the Streamlit process.
+
+The loader and generate functions must be importable module-level functions,
+e.g. generation.load_gemma and generation.generate_gemma.
+
+A worker that dies (e.g. OOM-killed) is replaced by a fresh fork of the master,
+and the request it was running fails instead of waiting forever.
+"""
+
+import atexit
+import gc
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+# Set in the pool master before forking; inherited by every worker
+_preloaded = None
+
+
+def _worker_loop(tasks, results, generate_fn, threads, running, slot):
+    import torch
+    torch.set_num_threads(threads)
+    model, tokenizer = _preloaded
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        request_id, deadline, args, kwargs = task
+        if deadline is not None and time.time() > deadline:
+            # The caller already gave up; don't let abandoned work delay newer requests
+            results.put((request_id, None, "request expired before a worker was free"))
+            continue
+        # Shared memory, so the master still knows the request if this process is killed
+        running[slot] = request_id
+        try:
+            results.put((request_id, generate_fn(model, tokenizer, *args, **kwargs), None))
+        except Exception as e:
+            results.put((request_id, None, f"{type(e).__name__}: {e}"))
+        running[slot] = 0
+
+
+def _pool_master(workers, loader_fn, loader_kwargs, generate_fn, threads, tasks, results, events):
+    global _preloaded
+    import torch
+    # Keep OpenMP single-threaded until after the fork; GNU OpenMP is not fork-safe
+    torch.set_num_threads(1)
+    try:
+        _preloaded = loader_fn(**loader_kwargs)
+    except Exception as e:
+        events.put(("ready", None, f"{type(e).__name__}: {e}"))
+        return
+    gc.collect()
+    gc.freeze()
+
+    fork = multiprocessing.get_context("fork")
+    running = fork.RawArray("q", workers)  # request id each worker is generating, 0 when idle
+
+    def start_worker(slot):
+        process = fork.Process(target=_worker_loop, args=(tasks, results, generate_fn, threads, running, slot),
+                               daemon=True)
+        process.start()
+        return process
+
+    processes = [start_worker(slot) for slot in range(workers)]
+    # The master reports on its own queue: a queue it had written to would be inherited by
+    # later forks with a stale feeder thread, and their results would never arrive
+    events.put(("ready", [process.pid for process in processes], None))
+
+    parent = multiprocessing.parent_process()
+    stopping = False
+    while any(process.is_alive() for process in processes):
+        # Exit with the Streamlit process even if it never called close()
+        if not stopping and parent is not None and not parent.is_alive():
+            stopping = True
+            for process in processes:
+                process.terminate()
+        for slot, process in enumerate(processes):
+            # Workers exit with 0 after close(); anything else is a crash or a kill
+            if not stopping and process.exitcode not in (None, 0):
+                request_id, running[slot] = running[slot], 0
+                processes[slot] = start_worker(slot)
+                events.put(("exited", (process.pid, processes[slot].pid, process.exitcode, request_id), None))
+        time.sleep(1)
+
+
+class GenerationWorkerPool:
+    """Pool of forked generation workers sharing preloaded model weights"""
+
+    def __init__(self, workers, loader_fn, generate_fn, loader_kwargs=None, threads_per_worker=None,
+                 startup_timeout=600, generation_timeout=None):
+        self.workers = workers
+        self.generation_timeout = generation_timeout
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        ctx = multiprocessing.get_context("spawn")
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._events = ctx.Queue()
+        self._futures = {}
+        self.restarts = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self._master = ctx.Process(
+            target=_pool_master,
+            args=(workers, loader_fn, loader_kwargs or {}, generate_fn, self.threads_per_worker,
+                  self._tasks, self._results, self._events),
+        )
+        self._master.start()
+        atexit.register(self.close)
+
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            try:
+                _, pids, error = self._events.get(timeout=1)
+                break
+            except queue.Empty:
+                if not self._master.is_alive():
+                    error = f"pool master exited with code {self._master.exitcode}"
+                    break
+                if time.monotonic() > deadline:
+                    self._master.terminate()
+                    raise RuntimeError("Worker pool did not start in time")
+        if error:
+            self._master.join()
+            raise RuntimeError(f"Worker pool failed to load model: {error}")
+        self.worker_pids = pids
+
+        self._dispatcher = threading.Thread(target=self._dispatch_results, daemon=True)
+        self._dispatcher.start()
+        self._watcher = threading.Thread(target=self._watch_workers, daemon=True)
+        self._watcher.start()
+
+    @classmethod
+    def from_env(cls, loader_fn, generate_fn, loader_kwargs=None):
+        """Build a pool sized by ARCHITECT_WORKERS, or None when multi-worker mode is off"""
+        workers = int(os.getenv("ARCHITECT_WORKERS", "0"))
+        if workers <= 0:
+            return None
+        threads = int(os.getenv("ARCHITECT_THREADS_PER_WORKER", "0")) or None
+        return cls(workers, loader_fn, generate_fn, loader_kwargs=loader_kwargs, threads_per_worker=threads,
+                   generation_timeout=float(os.getenv("ARCHITECT_GENERATION_TIMEOUT", "120")) or None)
+
+    def _dispatch_results(self):
+        while True:
+            request_id, value, error = self._results.get()
+            if request_id is None:
+                break
+            self._resolve(request_id, value, error)
+
+    def _watch_workers(self):
+        while True:
+            event, value, _ = self._events.get()
+            if event is None:
+                break
+            old_pid, new_pid, exitcode, request_id = value
+            with self._lock:
+                self.worker_pids = [new_pid if pid == old_pid else pid for pid in self.worker_pids]
+                self.restarts += 1
+            self._resolve(request_id, None,
+                          f"generation worker {old_pid} died (exit code {exitcode}); it has been restarted")
+
+    def _resolve(self, request_id, value, error):
+        with self._lock:
+            future = self._futures.pop(request_id, None)
+        # Skip requests that already finished or that the caller gave up on
+        if future is None or future.done():
+            return
+        if error:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(value)
+
+    def submit(self, *args, timeout=None, **kwargs):
+        """Queue a generation call; returns a Future with the generated text. Workers skip it after `timeout` s"""
+        future = Future()
+        with self._lock:
+            request_id = next(self._ids)
+            self._futures[request_id] = future
+        # Wall-clock deadline, since it is checked in another process
+        deadline = time.time() + timeout if timeout else None
+        self._tasks.put((request_id, deadline, args, kwargs))
+        return future
+
+    def generate(self, *args, timeout=None, **kwargs):
+        """Blocking wrapper around submit(); waits at most `timeout` (default generation_timeout) seconds"""
+        timeout = timeout or self.generation_timeout
+        future = self.submit(*args, timeout=timeout, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise FutureTimeout(f"No response from the worker pool within {timeout:g}s") from None
+
+    @property
+    def pids(self):
+        """Process ids of the pool master and all workers"""
+        return [self._master.pid] + list(self.worker_pids)
+
+    def close(self):
+        """Stop the workers and the result dispatcher"""
+        if not self._master.is_alive():
+            return
+        for _ in range(self.workers):
+            self._tasks.put(None)
+        self._master.join(timeout=30)
+        if self._master.is_alive():
+            self._master.terminate()
+        self._results.put((None, None, None))
+        self._events.put((None, None, None))
+        # Let both threads drain their queues before the interpreter tears them down
+        self._dispatcher.join(timeout=5)
+        self._watcher.join(timeout=5)